@@ -0,0 +1,259 @@
+# In-memory model of a Chromium extension API schema.
+#
+# A schema file is parsed once into a tree of Namespace, Function, Event,
+# Type, Property and Param nodes. References ($ref) to types defined in the
+# same file are resolved, and the "Additional objects" that each page lists
+# are collected while the tree is built, so the page generators never have
+# to walk the raw JSON.
+#
+# Schemas repeat the same parameters, properties and enums in many places.
+# Nodes below the top level of a schema file are hash-consed: a node equal
+# to one already built, child for child, is replaced by that one, so each
+# distinct subtree is built and kept once, and the describe_* functions,
+# whose cache is keyed by node, describe it once. Shared nodes are never
+# changed after they are built. The one attribute set later, `target`,
+# follows from `ref_name`. A file can hold several namespaces, in which the
+# same "$ref" names different types, so `ref_name` is part of what makes
+# nodes equal.
+#
+# When asked to, build_namespaces also gives each namespace and each of its
+# functions, events, types and properties a digest of the JSON it was built
+# from, which the render cache uses to tell whether a page would change.
+
+import json
+import hashlib
+
+class EnumValue(object):
+    __slots__ = ('name', 'description')
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+
+class Type(object):
+    # Attributes that are absent from the schema are None, so that generators
+    # can tell "missing" apart from "empty" the same way they could with
+    # `'key' in t` on the raw dicts.
+    __slots__ = ('id', 'name', 'type', 'description', 'optional',
+                 'unsupported', 'ref', 'ref_name', 'target', 'choices',
+                 'items', 'properties', 'parameters', 'returns', 'enum',
+                 'min_items', 'max_items', 'minimum', 'maximum',
+                 'anonymous_objects', 'digest')
+
+    def __init__(self):
+        for slot in Type.__slots__:
+            setattr(self, slot, None)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.id or self.name)
+
+class Property(Type):
+    __slots__ = ()
+
+class Param(Type):
+    __slots__ = ()
+
+class Function(Type):
+    __slots__ = ()
+
+class Event(Type):
+    __slots__ = ('extra_parameters',)
+
+class Namespace(object):
+    __slots__ = ('name', 'json_name', 'description', 'functions', 'events',
+                 'types', 'properties', 'digest')
+
+    def __repr__(self):
+        return '<Namespace {}>'.format(self.name)
+
+# Shares nodes between the places in one schema file that hold equal ones.
+class Interner(object):
+    def __init__(self):
+        self.nodes = {}
+        self.enums = {}
+
+    # Returns the node equal to `node` that was built first. Its children
+    # are already shared, so they are compared by identity. Values carry
+    # their types, so that 1 and 1.0 or True stay apart.
+    def node(self, node):
+        key = (node.__class__, _typed(node.id), _typed(node.name), _typed(node.type),
+               _typed(node.description), _typed(node.optional), _typed(node.unsupported),
+               _typed(node.ref), _typed(node.ref_name), _typed(node.min_items), _typed(node.max_items),
+               _typed(node.minimum), _typed(node.maximum), id(node.enum), id(node.items),
+               id(node.returns), _ids(node.choices), _ids(node.properties),
+               _ids(node.parameters))
+        return self.nodes.setdefault(key, node)
+
+    def enum(self, values):
+        key = tuple(_typed(e) if isinstance(e, basestring) else
+                    (_typed(e.name), _typed(e.description)) for e in values)
+        return self.enums.setdefault(key, values)
+
+def _typed(value):
+    return (value.__class__, value)
+
+def _ids(nodes):
+    if nodes is None:
+        return None
+    return tuple(id(n) for n in nodes)
+
+def _build_node(raw, cls, ns_name, name, refs, interner):
+    node = cls()
+    node.id = raw.get('id')
+    node.name = name
+    node.type = raw.get('type')
+    node.description = raw.get('description')
+    node.optional = raw.get('optional', False)
+    node.unsupported = raw.get('unsupported', False)
+    node.min_items = raw.get('minItems')
+    node.max_items = raw.get('maxItems')
+    node.minimum = raw.get('minimum')
+    node.maximum = raw.get('maximum')
+
+    if '$ref' in raw:
+        ref = raw['$ref']
+        node.ref = ref
+        if '.' in ref:
+            node.ref_name = ref
+        else:
+            node.ref_name = ns_name + '.' + ref
+        refs.append(node)
+
+    # Choices and array items are documented under the name of the thing
+    # that holds them.
+    if 'choices' in raw:
+        node.choices = [ _build_shared(c, Type, ns_name, name, refs, interner)
+                         for c in raw['choices'] ]
+
+    if 'items' in raw:
+        node.items = _build_shared(raw['items'], Type, ns_name, name, refs, interner)
+
+    if 'properties' in raw:
+        node.properties = [ _build_shared(p, Property, ns_name, prop_name, refs, interner)
+                            for (prop_name, p) in raw['properties'].items() ]
+
+    if 'parameters' in raw:
+        node.parameters = _build_params(raw['parameters'], ns_name, refs, interner)
+
+    if 'returns' in raw:
+        node.returns = _build_shared(raw['returns'], Type, ns_name,
+                                     raw['returns'].get('name'), refs, interner)
+
+    if 'enum' in raw:
+        node.enum = interner.enum([ e if type(e) == unicode else
+                                    EnumValue(e['name'], e.get('description'))
+                                    for e in raw['enum'] ])
+
+    return node
+
+# Builds a node below the top level, which may be shared.
+def _build_shared(raw, cls, ns_name, name, refs, interner):
+    return interner.node(_build_node(raw, cls, ns_name, name, refs, interner))
+
+def _build_params(raw_params, ns_name, refs, interner):
+    return [ _build_shared(p, Param, ns_name, p.get('name'), refs, interner)
+             for p in raw_params ]
+
+def collect_anonymous_objects(obj, anonymous_objects):
+    def test_item(item):
+        if item.choices is not None:
+            for choice in item.choices:
+                test_item(choice)
+        elif item.type is None:
+            return
+        elif item.type == 'object':
+            anonymous_objects.append(item)
+            collect_anonymous_objects(item, anonymous_objects)
+        elif item.type == 'array':
+            if item.items.type == 'object':
+                anonymous_objects.append(item.items)
+            collect_anonymous_objects(item.items, anonymous_objects)
+        elif item.type == 'function':
+            collect_anonymous_objects(item, anonymous_objects)
+
+    if obj.type == 'object':
+        for prop in obj.properties or []:
+            test_item(prop)
+    elif obj.type == 'function':
+        for param in obj.parameters or []:
+            test_item(param)
+
+_MEMBERS = ('functions', 'events', 'types', 'properties')
+
+def _digest(raw):
+    return hashlib.sha1(json.dumps(raw, separators=(',', ':'))).hexdigest()
+
+# Gives the top-level nodes of a namespace the digests of their JSON, and the
+# namespace a digest of its own JSON and theirs.
+def _add_digests(ns, raw_ns):
+    h = hashlib.sha1(_digest([ (k, v) for (k, v) in raw_ns.items() if k not in _MEMBERS ]))
+    for (node, raw) in zip(ns.functions or [], raw_ns.get('functions', [])):
+        node.digest = _digest(raw)
+    for (node, raw) in zip(ns.events or [], raw_ns.get('events', [])):
+        node.digest = _digest(raw)
+    for (node, raw) in zip(ns.types or [], raw_ns.get('types', [])):
+        node.digest = _digest(raw)
+    for (node, raw) in zip(ns.properties or [], raw_ns.get('properties', {}).items()):
+        node.digest = _digest(raw)
+    for section in _MEMBERS:
+        for node in getattr(ns, section) or []:
+            h.update(node.digest)
+    ns.digest = h.hexdigest()
+
+def build_namespaces(data, json_name, digests=False):
+    namespaces = []
+    refs = []
+    types = {}
+    interner = Interner()
+
+    for raw_ns in data:
+        ns = Namespace()
+        ns.name = raw_ns['namespace']
+        ns.json_name = json_name
+        ns.description = raw_ns.get('description')
+        ns.functions = None
+        ns.events = None
+        ns.types = None
+        ns.properties = None
+        ns.digest = None
+
+        if 'functions' in raw_ns:
+            ns.functions = [ _build_node(f, Function, ns.name, f['name'], refs, interner)
+                             for f in raw_ns['functions'] ]
+            for func in ns.functions:
+                func.anonymous_objects = []
+                for param in func.parameters or []:
+                    collect_anonymous_objects(param, func.anonymous_objects)
+
+        if 'events' in raw_ns:
+            ns.events = []
+            for e in raw_ns['events']:
+                event = _build_node(e, Event, ns.name, e['name'], refs, interner)
+                event.extra_parameters = _build_params(
+                    e.get('extraParameters', []), ns.name, refs, interner)
+                event.anonymous_objects = []
+                collect_anonymous_objects(event, event.anonymous_objects)
+                ns.events.append(event)
+
+        if 'types' in raw_ns:
+            ns.types = [ _build_node(t, Type, ns.name, t.get('name'), refs, interner)
+                         for t in raw_ns['types'] ]
+            for t in ns.types:
+                t.anonymous_objects = []
+                collect_anonymous_objects(t, t.anonymous_objects)
+
+        if 'properties' in raw_ns:
+            ns.properties = [ _build_node(p, Property, ns.name, prop_name, refs, interner)
+                              for (prop_name, p) in raw_ns['properties'].items() ]
+
+        if digests:
+            _add_digests(ns, raw_ns)
+        for t in ns.types or []:
+            types[ns.name + '.' + t.id] = t
+
+        namespaces.append(ns)
+
+    for node in refs:
+        node.target = types.get(node.ref_name)
+
+    return namespaces
@@ -0,0 +1,322 @@
+# Output formats for generated pages.
+#
+# The page generators in transform.py decide what goes on a page; a backend
+# decides how it is written. Each backend has a table of templates for the
+# pieces of a page (paragraphs, headings, definition lists, links to other
+# pages and so on), which are turned into functions once, when the backend
+# is created, and the generators call those for every piece they emit.
+#
+# There are three backends:
+#
+#   mdn       the MDN wiki's own format, with KumaScript macros, which is
+#             what upload.py publishes
+#   html      standalone HTML pages, with links between them resolved
+#   markdown  Markdown pages with front matter, for other documentation sites
+#
+# Every page starts with the same JSON head, giving its title and tags.
+# A backend's document() turns the head and body into the text of a file.
+
+import re
+import cgi
+import json
+import collections
+
+LICENSE = '''
+// Copyright 2015 The Chromium Authors. All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are
+// met:
+//
+//    * Redistributions of source code must retain the above copyright
+// notice, this list of conditions and the following disclaimer.
+//    * Redistributions in binary form must reproduce the above
+// copyright notice, this list of conditions and the following disclaimer
+// in the documentation and/or other materials provided with the
+// distribution.
+//    * Neither the name of Google Inc. nor the names of its
+// contributors may be used to endorse or promote products derived from
+// this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+// "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+// LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+// A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+// OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+// SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+// LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+// DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+// THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+// (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+// OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+'''
+
+COMPAT_TABLE = '''
+<h2 id="Browser_compatibility">Browser compatibility</h2>
+<p>{{ CompatibilityTable() }}</p>
+<div id="compat-desktop">
+<table class="compat-table">
+ <tbody>
+  <tr>
+   <th>Feature</th>
+   <th>Chrome</th>
+   <th>Edge</th>
+   <th>Firefox (Gecko)</th>
+   <th>Opera</th>
+  </tr>
+  <tr>
+   <td>Basic support</td>
+   <td>{{ CompatVersionUnknown }}</td>
+   <td>{{ CompatUnknown }}</td>
+   <td>{{ %s }}</td>
+   <td>{{ CompatOpera('33') }}</td>
+  </tr>
+ </tbody>
+</table>
+</div>
+<div id="compat-mobile">
+<table class="compat-table">
+ <tbody>
+  <tr>
+   <th>Feature</th>
+   <th>Edge</th>
+   <th>Firefox OS</th>
+   <th>Firefox Mobile (Gecko)</th>
+  <tr>
+   <td>Basic support</td>
+   <td>{{ CompatNo() }}</td>
+   <td>{{ CompatNo() }}</td>
+   <td>{{ CompatNo() }}</td>
+  </tr>
+ </tbody>
+</table>
+</div>
+'''
+
+# Links in schema descriptions, which preprocess.py has turned into macros.
+_REF_MACRO = re.compile(r"\{\{WebExtAPIRef\('([^']*)'.*?\)\}\}")
+
+class Backend(object):
+    name = None
+    # Added to each page's slug to make its file name.
+    suffix = ''
+    TEMPLATES = {}
+
+    # Whether pages link to each other, through `resolve`.
+    resolves_refs = False
+
+    # `resolve` gives the slug of the page that a name such as "tabs.query()"
+    # or "sockets.tcp" refers to, given the namespace the name appears in. A
+    # method takes the place of the template of the same name.
+    def __init__(self, resolve):
+        self.resolve = resolve
+        for (name, template) in self.TEMPLATES.items():
+            if not hasattr(self.__class__, name):
+                setattr(self, name, template.format)
+
+    # Text from a schema, such as a description, of the namespace `ns_name`.
+    def text(self, text, ns_name=None):
+        return text
+
+    # The file holding a page, given its head and body.
+    def document(self, slug, head, body):
+        return head + body
+
+class MdnBackend(Backend):
+    name = 'mdn'
+    TEMPLATES = {
+        'sidebar': '{{{{AddonSidebar()}}}}',
+        'index_sidebar': '{{{{AddonSidebar}}}}',
+        'para': '<p>{}</p>',
+        'para_start': '<p>',
+        'para_end': '</p>',
+        'code': '<code>{}</code>',
+        'h2': '<h2>{}</h2>',
+        'h2_id': '<h2 id="{1}">{0}</h2>',
+        'h3': '<h3>{}</h3>',
+        'h3_id': '<h3 id="{1}">{0}</h3>',
+        'code_start': '<pre class="brush: js">',
+        'code_end': '</pre>',
+        'dl_start': '<dl>',
+        'dl_end': '</dl>',
+        'dt': '<dt><code>{}</code></dt>',
+        'dt_optional': '<dt><code>{}</code>{{{{optional_inline}}}}</dt>',
+        'dd': '<dd>{}</dd>',
+        'values_start': '<p><dl class="api-reference-values">',
+        'values_end': '</dl></p>',
+        'args_start': '<dl class="api-reference-values">',
+        'args_end': '</dl>',
+        'array_of': '<code>array</code> of {}',
+        'anchor': '<a href="#{0}"><code>{1}</code></a>',
+        'ref': "{{{{WebExtAPIRef('{}')}}}}",
+        'index_entry': '<dt>{{{{WebExtAPIRef("{}")}}}}</dt>',
+        'embed_type': '{{{{WebExtAPIEmbedType("{0}")}}}}',
+        'enum_values': 'Possible values are: {}.',
+        'enum_value': '<code>"{}"</code>',
+        'enum_table_start': 'Possible values are:<table class="standard-table"><tbody>\n',
+        'enum_row': '  <tr>\n    <td><code>{}</code></td>\n    <td>{}</td>\n  </td>\n',
+        'enum_table_end': '</tbody></table>\n',
+        'permission': '<p>To use this API, an extension must request the {} permission in its manifest.json file.</p>',
+        'permissions': '<p>To use this API, an extension must request the {} permissions in its manifest.json file.</p>',
+        'examples': '{{{{WebExtExamples}}}}',
+        'chrome_compat': '{{{{WebExtChromeCompat}}}}',
+        'acknowledgement': '<div class="note">\n'
+                           '<strong>Acknowledgements</strong>\n'
+                           "<p>This API is based on Chromium's <a href=\"{0}\"><code>{1}</code></a> API. \n"
+                           'This documentation is derived from <a href="{2}"><code>{3}</code></a> in the Chromium code.</p>\n'
+                           '</div>',
+        'license': '<div class="hidden"><pre>\n{}\n</pre></div>',
+    }
+
+    def compat(self, supported):
+        if supported:
+            return COMPAT_TABLE % "CompatGeckoDesktop('45.0')"
+        return COMPAT_TABLE % 'CompatNo()'
+
+# MDN's markup, with the macros replaced by what they stand for.
+class HtmlBackend(MdnBackend):
+    name = 'html'
+    suffix = '.html'
+    resolves_refs = True
+    TEMPLATES = dict(MdnBackend.TEMPLATES, **{
+        'sidebar': '',
+        'index_sidebar': '',
+        'h3': '<h3 id="{0}">{0}</h3>',
+        'dt_optional': '<dt><code>{}</code> <em>(optional)</em></dt>',
+        'link': '<a href="{0}"><code>{1}</code></a>',
+        'embed_link': '<p class="embed">See {}.</p>',
+        'examples': '',
+        'chrome_compat': '',
+        'compat_table': '<h2 id="Browser_compatibility">Browser compatibility</h2>\n'
+                        '<table class="compat-table">\n'
+                        '<tr><th>Feature</th><th>Chrome</th><th>Edge</th><th>Firefox</th><th>Opera</th></tr>\n'
+                        '<tr><td>Basic support</td><td>Yes</td><td>?</td><td>{}</td><td>33</td></tr>\n'
+                        '</table>',
+        'page': u'<!DOCTYPE html>\n'
+                u'<html>\n'
+                u'<head>\n'
+                u'<meta charset="utf-8">\n'
+                u'<title>{title}</title>\n'
+                u'<style>\n'
+                u'.hidden {{ display: none; }}\n'
+                u'.note, .embed {{ background: #eef; padding: 0.5em; }}\n'
+                u'</style>\n'
+                u'</head>\n'
+                u'<body>\n'
+                u'<p><a href="../{namespace}/INDEX.html">{namespace}</a></p>\n'
+                u'<h1>{title}</h1>\n'
+                u'{body}'
+                u'</body>\n'
+                u'</html>\n',
+    })
+
+    # Pages are all one directory down from the top, so a link from one to
+    # another goes up a level first.
+    def url(self, name, ns_name=None):
+        return '../{}{}'.format(self.resolve(name, ns_name), self.suffix)
+
+    # A link to the page of `name`, labelled with the link text that follows
+    # the name, if there is any.
+    def ref(self, name, ns_name=None):
+        (target, space, label) = name.partition(' ')
+        return self.link(self.url(name, ns_name), label or target)
+
+    def index_entry(self, name):
+        return '<dt>{}</dt>'.format(self.ref(name))
+
+    def embed_type(self, ref, ref_name):
+        return self.embed_link(self.ref(ref_name))
+
+    def compat(self, supported):
+        return self.compat_table('45.0' if supported else 'No')
+
+    def text(self, text, ns_name=None):
+        if text is None or '{{' not in text:
+            return text
+        return _REF_MACRO.sub(lambda m: self.ref(m.group(1), ns_name), text)
+
+    def document(self, slug, head, body):
+        title = json.loads(head)['title']
+        if isinstance(body, str):
+            body = body.decode('utf-8')
+        page = self.page(title=cgi.escape(title), namespace=slug.split('/')[0], body=body)
+        return page.encode('utf-8')
+
+# Markdown. Descriptions in the schemas are HTML, which Markdown passes
+# through. Lists are nested by indenting their items.
+class MarkdownBackend(HtmlBackend):
+    name = 'markdown'
+    suffix = '.md'
+    TEMPLATES = dict(HtmlBackend.TEMPLATES, **{
+        'para': '{}\n',
+        'para_start': '',
+        'para_end': '',
+        'h2': '\n## {}\n',
+        'h2_id': '\n## {0}\n',
+        'h3': '\n### {}\n',
+        'h3_id': '\n### {0}\n',
+        'code_start': '```js',
+        'code_end': '```\n',
+        'dl_start': '',
+        'dl_end': '',
+        'dt': '\n- `{}`',
+        'dt_optional': '\n- `{}` (optional)',
+        'values_start': '\n',
+        'values_end': '',
+        'args_start': '\n',
+        'args_end': '',
+        'array_of': '`array` of {}',
+        'anchor': '[`{1}`](#{0})',
+        'link': '[`{1}`]({0})',
+        'embed_link': '\n\nSee {}.',
+        'enum_value': '`"{}"`',
+        'enum_table_start': 'Possible values are:\n\n| Value | Description |\n| --- | --- |\n',
+        'enum_row': '| `{}` | {} |\n',
+        'enum_table_end': '\n',
+        'permission': 'To use this API, an extension must request the {} permission in its manifest.json file.\n',
+        'permissions': 'To use this API, an extension must request the {} permissions in its manifest.json file.\n',
+        'compat_table': '\n## Browser compatibility\n\n'
+                        '| Feature | Chrome | Edge | Firefox | Opera |\n'
+                        '| --- | --- | --- | --- | --- |\n'
+                        '| Basic support | Yes | ? | {} | 33 |\n',
+        'acknowledgement': '\n> **Acknowledgements**\n'
+                           '>\n'
+                           "> This API is based on Chromium's [`{1}`]({0}) API.\n"
+                           '> This documentation is derived from [`{3}`]({2}) in the Chromium code.\n',
+        'license': '<!--\n{}\n-->',
+        'page': u'---\n'
+                u'title: {title}\n'
+                u'tags: {tags}\n'
+                u'---\n'
+                u'\n'
+                u'# {name}\n'
+                u'\n'
+                u'{body}',
+    })
+
+    def index_entry(self, name):
+        return '\n- {}'.format(self.ref(name))
+
+    # Choices and arrays wrap text that is already code, which would close
+    # the backticks early.
+    def code(self, text):
+        if '`' in text:
+            return text
+        return '`{}`'.format(text)
+
+    # A description goes under its list item, indented to the item's
+    # content, so that lists inside it are nested.
+    def dd(self, text):
+        lines = text.split('\n')
+        return '\n' + '\n'.join('  ' + line if line else line for line in lines)
+
+    def document(self, slug, head, body):
+        head = json.loads(head, object_pairs_hook=collections.OrderedDict)
+        if isinstance(body, str):
+            body = body.decode('utf-8')
+        page = self.page(title=json.dumps(head['title']), tags=json.dumps(head['tags']),
+                         name=head['title'], body=body)
+        return page.encode('utf-8')
+
+BACKENDS = collections.OrderedDict((backend.name, backend) for backend in
+                                   (MdnBackend, HtmlBackend, MarkdownBackend))
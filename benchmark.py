@@ -0,0 +1,305 @@
+# Benchmarks for json-transform.py and upload.py.
+#
+# Run as:
+# python benchmark.py data/ --output bench.json
+# python benchmark.py data/ --output new.json --compare bench.json
+#
+# Generation is measured over every schema in data/ that parses, and over
+# synthetic copies of tabs.json scaled up 10x and 100x. Each scenario runs in
+# its own process so that peak RSS is per scenario, and the fastest of
+# --repeat runs is kept. Uploads are measured
+# against a local stub wiki at several concurrency levels.
+#
+# With --compare, each rate is compared with an earlier results file, and
+# the exit status is non-zero if any got slower by more than --threshold.
+
+import os
+import sys
+import json
+import time
+import copy
+import glob
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+import collections
+import multiprocessing
+import BaseHTTPServer
+import SocketServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def schema_names(in_dir):
+    names = set()
+    for path in glob.glob(os.path.join(in_dir, '*.json')) + glob.glob(os.path.join(in_dir, '*.idl')):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if not name.startswith('_'):
+            names.add(name)
+    return sorted(names)
+
+# Writes a copy of tabs.json with every function, event, type and property
+# repeated `scale` times, and returns its name.
+def write_scaled_tabs(transform, in_dir, out_dir, scale):
+    text = transform.preprocess.preprocess_json(open(os.path.join(in_dir, 'tabs.json')).read())
+    data = json.loads(text, object_pairs_hook=collections.OrderedDict)
+
+    def renamed(node, key, i):
+        node = copy.deepcopy(node)
+        if i:
+            node[key] = '{}_{}'.format(node[key], i)
+        return node
+
+    for ns in data:
+        for (section, key) in (('functions', 'name'), ('events', 'name'), ('types', 'id')):
+            if section in ns:
+                ns[section] = [ renamed(item, key, i) for i in range(scale) for item in ns[section] ]
+        if 'properties' in ns:
+            properties = collections.OrderedDict()
+            for i in range(scale):
+                for (name, prop) in ns['properties'].items():
+                    properties['{}_{}'.format(name, i) if i else name] = copy.deepcopy(prop)
+            ns['properties'] = properties
+
+    name = 'tabs_x{}'.format(scale)
+    json.dump(data, open(os.path.join(out_dir, name + '.json'), 'w'), indent=2)
+    return name
+
+# Runs in a child process: generates every page of `names` and returns the
+# timings.
+def run_generate(in_dir, names, scale):
+    import transform
+    out_dir = tempfile.mkdtemp(prefix='bench-out-')
+    scaled_dir = None
+    try:
+        if scale:
+            scaled_dir = tempfile.mkdtemp(prefix='bench-data-')
+            names = [write_scaled_tabs(transform, in_dir, scaled_dir, scale)]
+            in_dir = scaled_dir
+
+        build = transform.Build(in_dir)
+        build.out_dir = out_dir
+
+        kinds = collections.OrderedDict(
+            (kind, {'pages': 0, 'seconds': 0.0})
+            for kind in ('function', 'event', 'type', 'property', 'index'))
+        schemas = collections.OrderedDict()
+        unparseable = []
+        errors = 0
+        parse_seconds = 0.0
+
+        start = time.time()
+        for name in names:
+            # The acknowledgement needs a source link for every schema.
+            build.json_sources.setdefault(name, transform.LINK1)
+
+            schema_start = time.time()
+            try:
+                transform.load_namespaces(build, name)
+            except Exception:
+                unparseable.append(name)
+                continue
+            parse_seconds += time.time() - schema_start
+
+            for (slug, task) in transform.page_tasks(build, name):
+                page_start = time.time()
+                try:
+                    transform.run_task(build, task)
+                except Exception:
+                    errors += 1
+                    continue
+                kinds[task[0]]['pages'] += 1
+                kinds[task[0]]['seconds'] += time.time() - page_start
+
+            schemas[name] = time.time() - schema_start
+        wall = time.time() - start
+    finally:
+        shutil.rmtree(out_dir)
+        if scaled_dir:
+            shutil.rmtree(scaled_dir)
+
+    pages = sum(k['pages'] for k in kinds.values())
+    for k in kinds.values():
+        k['pages_per_sec'] = k['pages'] / k['seconds'] if k['seconds'] else None
+
+    return {
+        'wall_seconds': wall,
+        'parse_seconds': parse_seconds,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'pages': pages,
+        'pages_per_sec': pages / wall if wall else None,
+        'errors': errors,
+        'unparseable': unparseable,
+        'by_kind': kinds,
+        'schemas': schemas,
+        'description_cache': build.descriptions.stats(),
+    }
+
+def in_child(func, *args):
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(func, args)
+    finally:
+        pool.close()
+        pool.join()
+
+# Runs func in a fresh child process `repeat` times and keeps the fastest run.
+def best_of(repeat, func, *args):
+    runs = [ in_child(func, *args) for i in range(repeat) ]
+    return min(runs, key=lambda r: r['wall_seconds'])
+
+# A wiki that accepts every PUT.
+class StubWikiHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one packet, so the client is not held up by
+    # delayed ACKs.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class StubWiki(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+def serve_stub_wiki(server):
+    server.serve_forever()
+
+# Runs in a child process: uploads every page under pages_dir and returns
+# the request rate.
+def run_upload(pages_dir, base_url, concurrency):
+    import upload
+    client = upload.WikiClient(upload.UploadConfig(
+        base_url=base_url, user='benchmark', password='benchmark',
+        concurrency=concurrency, retries=0))
+
+    start = time.time()
+    results = upload.upload(pages_dir, client)
+    wall = time.time() - start
+
+    failures = len([ True for (slug, status, error) in results if error ])
+    return {
+        'requests': len(results),
+        'failures': failures,
+        'wall_seconds': wall,
+        'requests_per_sec': len(results) / wall if wall else None,
+    }
+
+def benchmark_upload(in_dir, levels, repeat):
+    try:
+        import requests
+    except ImportError:
+        print 'requests is not installed, skipping the upload benchmark'
+        return None
+
+    pages_dir = tempfile.mkdtemp(prefix='bench-pages-')
+    server = StubWiki(('127.0.0.1', 0), StubWikiHandler)
+    stub = multiprocessing.Process(target=serve_stub_wiki, args=(server,))
+    stub.daemon = True
+    stub.start()
+    server.socket.close()
+    base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+    try:
+        subprocess.check_call([sys.executable, os.path.join(HERE, 'json-transform.py'),
+                               in_dir, pages_dir, 'tabs', 'windows', 'runtime', 'web_request'])
+        results = collections.OrderedDict()
+        for concurrency in levels:
+            results[str(concurrency)] = best_of(repeat, run_upload, pages_dir, base_url, concurrency)
+            print 'upload, concurrency {}: {:.0f} requests/s'.format(
+                concurrency, results[str(concurrency)]['requests_per_sec'])
+        return results
+    finally:
+        stub.terminate()
+        shutil.rmtree(pages_dir)
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=HERE,
+                                       stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Every rate in a results file, keyed by a readable path.
+def rates(results):
+    found = collections.OrderedDict()
+    for (scenario, r) in results.get('generate', {}).items():
+        found['generate/{} pages/s'.format(scenario)] = r['pages_per_sec']
+        for (kind, k) in r['by_kind'].items():
+            found['generate/{}/{} pages/s'.format(scenario, kind)] = k['pages_per_sec']
+    for (concurrency, r) in (results.get('upload') or {}).items():
+        found['upload/concurrency {} requests/s'.format(concurrency)] = r['requests_per_sec']
+    return found
+
+def compare(old, new, threshold):
+    old_rates = rates(old)
+    regressions = 0
+    print '{:<50} {:>10} {:>10} {:>8}'.format('', 'before', 'after', 'change')
+    for (key, value) in rates(new).items():
+        before = old_rates.get(key)
+        if not before or not value:
+            continue
+        change = value / before - 1
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print '{:<50} {:>10.1f} {:>10.1f} {:>+7.1%}{}'.format(key, before, value, change, flag)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark page generation and upload.')
+    parser.add_argument('in_dir')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare with an earlier results file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown that counts as a regression (default 0.1 = 10%%)')
+    parser.add_argument('--scales', default='10,100',
+                        help='comma-separated scale factors for synthetic copies of tabs.json')
+    parser.add_argument('--concurrency', default='1,4,8,16',
+                        help='comma-separated upload concurrency levels')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='run each measurement this many times and keep the fastest')
+    parser.add_argument('--skip-upload', action='store_true')
+    args = parser.parse_args()
+
+    results = collections.OrderedDict()
+    results['commit'] = current_commit()
+    results['python'] = sys.version.split()[0]
+    results['generate'] = collections.OrderedDict()
+
+    scenarios = [('data', None)]
+    scenarios += [ ('tabs_x' + s, int(s)) for s in args.scales.split(',') if s ]
+    names = schema_names(args.in_dir)
+    for (scenario, scale) in scenarios:
+        r = best_of(args.repeat, run_generate, args.in_dir, names, scale)
+        results['generate'][scenario] = r
+        print '{}: {} pages in {:.2f}s ({:.0f} pages/s), parse {:.2f}s, peak RSS {} KB'.format(
+            scenario, r['pages'], r['wall_seconds'], r['pages_per_sec'],
+            r['parse_seconds'], r['peak_rss_kb'])
+        if r['description_cache']['misses']:
+            print '  description cache: {hits} hits, {misses} misses'.format(**r['description_cache'])
+        for (kind, k) in r['by_kind'].items():
+            if k['pages']:
+                print '  {:<10} {:>6} pages {:>8.0f} pages/s'.format(kind, k['pages'], k['pages_per_sec'])
+
+    if not args.skip_upload:
+        levels = [ int(c) for c in args.concurrency.split(',') if c ]
+        results['upload'] = benchmark_upload(args.in_dir, levels, args.repeat)
+
+    if args.output:
+        json.dump(results, open(args.output, 'w'), indent=1, separators=(',', ': '))
+
+    if args.compare:
+        if compare(json.load(open(args.compare)), results, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# Reads Chromium's feature files (_api_features.json,
+# _permission_features.json, _manifest_features.json and
+# _behavior_features.json), which say on which channels, in which contexts
+# and for which kinds of extension each API is available, and what it
+# depends on.
+#
+# A feature is either a dict of properties or a list of alternatives, and is
+# available if any one of the alternatives is. A feature named "a.b" takes
+# the properties of its parent "a" that it does not set itself, unless it
+# says "noparent". When the parent has alternatives, the one marked
+# "default_parent" is used, or the first.
+
+import os
+import json
+import hashlib
+import collections
+
+import preprocess
+
+FEATURE_FILES = collections.OrderedDict([
+    ('api', '_api_features.json'),
+    ('permission', '_permission_features.json'),
+    ('manifest', '_manifest_features.json'),
+    ('behavior', '_behavior_features.json'),
+])
+
+# From least to most stable. A feature is available on its own channel and
+# on every less stable one.
+CHANNELS = ['trunk', 'canary', 'dev', 'beta', 'stable']
+
+# Properties that belong to one definition and are not inherited.
+_NOT_INHERITED = ('noparent', 'default_parent')
+
+class QueryError(Exception):
+    pass
+
+# What to build documentation for: a channel, an extension type and a
+# context, given on the command line as "channel=stable,context=...".
+class Query(object):
+    __slots__ = ('channel', 'extension_type', 'context', 'platform',
+                 'manifest_version')
+
+    def __init__(self, channel='stable', extension_type='extension',
+                 context='blessed_extension', platform=None, manifest_version=2):
+        self.channel = channel
+        self.extension_type = extension_type
+        self.context = context
+        self.platform = platform
+        self.manifest_version = manifest_version
+
+    @classmethod
+    def parse(cls, text):
+        query = cls()
+        for item in text.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            if '=' not in item:
+                raise QueryError('expected key=value, got "{}"'.format(item))
+            (key, value) = [ s.strip() for s in item.split('=', 1) ]
+            key = key.replace('-', '_')
+            if key not in cls.__slots__:
+                raise QueryError('unknown query key "{}"'.format(key))
+            if key == 'manifest_version':
+                value = int(value)
+            elif key == 'channel' and value not in CHANNELS:
+                raise QueryError('unknown channel "{}"'.format(value))
+            setattr(query, key, value)
+        return query
+
+    def __repr__(self):
+        return ','.join('{}={}'.format(key, getattr(self, key))
+                        for key in self.__slots__ if getattr(self, key) is not None)
+
+def load_feature_file(path):
+    text = preprocess.preprocess_json(open(path).read())
+    return json.loads(text, object_pairs_hook=collections.OrderedDict)
+
+def _alternatives(value):
+    if isinstance(value, list):
+        return value
+    return [value]
+
+# The features of one file, keyed by name, each as a list of alternatives
+# with their inherited properties filled in.
+def resolve_features(raw):
+    resolved = {}
+
+    def resolve(name):
+        if name in resolved:
+            return resolved[name]
+
+        parent = None
+        if '.' in name:
+            parent_name = name.rsplit('.', 1)[0]
+            while parent_name not in raw and '.' in parent_name:
+                parent_name = parent_name.rsplit('.', 1)[0]
+            if parent_name in raw:
+                parents = resolve(parent_name)
+                defaults = [ p for p in parents if p.get('default_parent') ]
+                parent = (defaults or parents)[0]
+
+        alternatives = []
+        for alt in _alternatives(raw[name]):
+            if parent is None or alt.get('noparent'):
+                feature = dict(alt)
+            else:
+                feature = dict((k, v) for (k, v) in parent.items() if k not in _NOT_INHERITED)
+                feature.update(alt)
+            alternatives.append(feature)
+        resolved[name] = alternatives
+        return alternatives
+
+    for name in raw:
+        resolve(name)
+    return resolved
+
+def _allows(value, wanted):
+    return value is None or value == 'all' or wanted in value
+
+class Features(object):
+    def __init__(self, in_dir, query):
+        self.query = query
+        self.features = {}
+        h = hashlib.sha1(repr(query))
+        for (kind, filename) in FEATURE_FILES.items():
+            path = os.path.join(in_dir, filename)
+            if os.path.exists(path):
+                h.update(open(path, 'rb').read())
+                self.features[kind] = resolve_features(load_feature_file(path))
+            else:
+                self.features[kind] = {}
+        # Identifies the feature files and query, for build manifests.
+        self.signature = h.hexdigest()
+        self._available = {}
+
+    # The feature that governs an API path such as "runtime.connectNative":
+    # the path itself if it has one, or else its closest ancestor. Returns
+    # the name of that feature, or None.
+    def find(self, path, kind='api'):
+        features = self.features[kind]
+        while path not in features:
+            if '.' not in path:
+                return None
+            path = path.rsplit('.', 1)[0]
+        return path
+
+    # Whether one alternative of a feature is available to the query, not
+    # counting its dependencies. Internal features, features limited to
+    # whitelisted or component extensions are not part of the public API.
+    def _matches(self, feature):
+        query = self.query
+        if feature.get('internal') or feature.get('whitelist') or feature.get('location'):
+            return False
+        channel = feature.get('channel')
+        if channel is not None and CHANNELS.index(channel) < CHANNELS.index(query.channel):
+            return False
+        if not _allows(feature.get('extension_types'), query.extension_type):
+            return False
+        if not _allows(feature.get('contexts'), query.context):
+            return False
+        if query.platform is not None and not _allows(feature.get('platforms'), query.platform):
+            return False
+        if feature.get('min_manifest_version', 0) > query.manifest_version:
+            return False
+        if feature.get('max_manifest_version', query.manifest_version) < query.manifest_version:
+            return False
+        return True
+
+    # The first alternative of a feature that is available to the query,
+    # dependencies included, or None.
+    def available_alternative(self, name, kind='api'):
+        key = (kind, name)
+        if key in self._available:
+            return self._available[key]
+
+        # Guards against dependency cycles.
+        self._available[key] = None
+        found = None
+        for feature in self.features[kind].get(name, []):
+            if not self._matches(feature):
+                continue
+            if all(self._dependency_available(dep) for dep in feature.get('dependencies', [])):
+                found = feature
+                break
+        self._available[key] = found
+        return found
+
+    def _dependency_available(self, dependency):
+        (kind, name) = dependency.split(':', 1)
+        if kind not in self.features:
+            return False
+        return self.available_alternative(name, kind) is not None
+
+    def is_available(self, path):
+        name = self.find(path)
+        return name is not None and self.available_alternative(name) is not None
+
+    # The permissions an extension has to request to use an API path.
+    def permissions(self, path):
+        name = self.find(path)
+        if name is None:
+            return []
+        feature = self.available_alternative(name)
+        if feature is None:
+            return []
+        return [ dep.split(':', 1)[1] for dep in feature.get('dependencies', [])
+                 if dep.startswith('permission:') ]
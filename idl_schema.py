@@ -0,0 +1,426 @@
+# Reads Chromium's extension IDL files into the same structure that
+# json.loads produces for the JSON schemas: a list of namespace dicts holding
+# "types", "functions", "events" and "properties".
+#
+# Only the subset of WebIDL that the extension APIs use is supported:
+# namespaces containing dictionaries, enums, callbacks and the Functions,
+# Events and Properties interfaces. Comments directly above a definition
+# become its description, and "|name|: ..." paragraphs in a function's
+# comment describe its parameters.
+
+import re
+import collections
+
+class IdlError(Exception):
+    pass
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+  | (?P<number>-?[0-9]+(?:\.[0-9]+)?)
+  | (?P<string>"[^"]*")
+  | (?P<punct>[{}()\[\];,=?])
+''', re.VERBOSE | re.DOTALL)
+
+_PARAM_COMMENT = re.compile(r' *\|([^|]*)\| *: *')
+_BLOCK_COMMENT_LINE = re.compile(r'^\s*\*? ?')
+
+# IDL types that map directly onto JSON schema types.
+_BASIC_TYPES = {
+    'DOMString': 'string',
+    'boolean': 'boolean',
+    'double': 'number',
+    'long': 'integer',
+    'any': 'any',
+}
+
+class Token(object):
+    __slots__ = ('kind', 'value', 'line', 'doc')
+
+    def __init__(self, kind, value, line, doc):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.doc = doc
+
+def _comment_text(comment):
+    if comment.startswith('//'):
+        return comment[2:]
+    lines = comment[2:-2].split('\n')
+    return '\n'.join(_BLOCK_COMMENT_LINE.sub(' ', line, 1).rstrip() for line in lines).strip('\n')
+
+# Splits the source into tokens. A run of comments is attached as `doc` to
+# the token that follows it, unless a blank line separates them.
+def tokenize(text, filename='<idl>'):
+    tokens = []
+    doc = []
+    line = 1
+    pos = 0
+    end = len(text)
+    match = _TOKEN.match
+    while pos < end:
+        m = match(text, pos)
+        if not m:
+            raise IdlError('{}:{}: unexpected character {!r}'.format(filename, line, text[pos]))
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'space':
+            if value.count('\n') > 1:
+                doc = []
+        elif kind == 'comment':
+            doc.append(_comment_text(value))
+        else:
+            if kind == 'string':
+                value = value[1:-1]
+            tokens.append(Token(kind, value, line, '\n'.join(doc) if doc else None))
+            doc = []
+        line += value.count('\n')
+        pos = m.end()
+    tokens.append(Token('eof', None, line, None))
+    return tokens
+
+# Splits a comment into the description of the thing itself and the
+# descriptions of its parameters, as Chromium's idl_schema.py does.
+def process_comment(comment):
+    parameter_starts = list(_PARAM_COMMENT.finditer(comment))
+    if parameter_starts:
+        parent_comment = comment[:parameter_starts[0].start()]
+    else:
+        parent_comment = comment
+
+    def clean(text):
+        return text.strip().replace('\n\n', '<br/><br/>').replace('\n', '')
+
+    params = {}
+    for (i, start) in enumerate(parameter_starts):
+        if i + 1 < len(parameter_starts):
+            param_end = parameter_starts[i + 1].start()
+        else:
+            param_end = len(comment)
+        params[start.group(1)] = clean(comment[start.end():param_end])
+    return (clean(parent_comment), params)
+
+class _Parser(object):
+    def __init__(self, tokens, filename):
+        self.tokens = tokens
+        self.pos = 0
+        self.filename = filename
+
+    def peek(self, value=None):
+        token = self.tokens[self.pos]
+        if value is None:
+            return token
+        return token.value == value and token.kind != 'string'
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def error(self, message):
+        raise IdlError('{}:{}: {}'.format(self.filename, self.peek().line, message))
+
+    def expect(self, value):
+        if not self.peek(value):
+            self.error('expected {!r}, got {!r}'.format(value, self.peek().value))
+        return self.next()
+
+    def ident(self):
+        token = self.next()
+        if token.kind != 'ident':
+            self.pos -= 1
+            self.error('expected an identifier, got {!r}'.format(token.value))
+        return token.value
+
+    def accept(self, value):
+        if self.peek(value):
+            self.next()
+            return True
+        return False
+
+    # [key, key=value, key=(value, value)]
+    def ext_attrs(self):
+        attrs = collections.OrderedDict()
+        if not self.accept('['):
+            return attrs
+        while not self.accept(']'):
+            key = self.ident()
+            value = True
+            if self.accept('='):
+                if self.accept('('):
+                    value = []
+                    while not self.accept(')'):
+                        value.append(self.next().value)
+                        self.accept(',')
+                else:
+                    value = self.next().value
+            attrs[key] = value
+            self.accept(',')
+        return attrs
+
+    # Returns (type, nullable), where type is ('named', name),
+    # ('array', type) or ('union', [(type, nullable), ...]).
+    def type(self):
+        if self.accept('('):
+            choices = [self.type()]
+            while self.accept('or'):
+                choices.append(self.type())
+            self.expect(')')
+            t = ('union', choices)
+        else:
+            t = ('named', self.ident())
+        while self.accept('['):
+            self.expect(']')
+            t = ('array', t)
+        optional = self.accept('?')
+        return (t, optional)
+
+    def args(self):
+        args = []
+        self.expect('(')
+        while not self.accept(')'):
+            attrs = self.ext_attrs()
+            optional = self.accept('optional')
+            (t, nullable) = self.type()
+            name = self.ident()
+            args.append((name, t, optional or nullable, attrs))
+            self.accept(',')
+        return args
+
+    def namespace(self, doc, attrs):
+        self.expect('namespace')
+        ns = {'name': self.ident(), 'doc': doc, 'attrs': attrs,
+              'definitions': []}
+        self.expect('{')
+        while not self.accept('}'):
+            doc = self.peek().doc
+            attrs = self.ext_attrs()
+            keyword = self.ident()
+            if keyword == 'dictionary':
+                ns['definitions'].append(self.dictionary(doc, attrs))
+            elif keyword == 'enum':
+                ns['definitions'].append(self.enum(doc, attrs))
+            elif keyword == 'callback':
+                ns['definitions'].append(self.callback(doc, attrs))
+            elif keyword == 'interface':
+                ns['definitions'].append(self.interface(doc, attrs))
+            else:
+                self.pos -= 1
+                self.error('unexpected {!r} in namespace'.format(keyword))
+        self.expect(';')
+        return ns
+
+    # Members of dictionaries and interfaces: either "type name;" or
+    # "static type name(args);".
+    def member(self):
+        doc = self.peek().doc
+        attrs = self.ext_attrs()
+        static = self.accept('static')
+        (t, optional) = self.type()
+        name = self.ident()
+        args = None
+        if self.peek('('):
+            args = self.args()
+        self.expect(';')
+        return {'name': name, 'doc': doc, 'attrs': attrs, 'static': static,
+                'type': t, 'optional': optional, 'args': args}
+
+    def dictionary(self, doc, attrs):
+        name = self.ident()
+        members = []
+        self.expect('{')
+        while not self.accept('}'):
+            members.append(self.member())
+        self.expect(';')
+        return ('dictionary', name, doc, attrs, members)
+
+    def enum(self, doc, attrs):
+        name = self.ident()
+        values = []
+        self.expect('{')
+        while not self.accept('}'):
+            token = self.next()
+            if token.kind not in ('ident', 'string'):
+                self.pos -= 1
+                self.error('expected an enum value, got {!r}'.format(token.value))
+            values.append((token.value, token.doc))
+            self.accept(',')
+        self.expect(';')
+        return ('enum', name, doc, attrs, values)
+
+    def callback(self, doc, attrs):
+        name = self.ident()
+        self.expect('=')
+        (returns, optional) = self.type()
+        args = self.args()
+        self.expect(';')
+        return ('callback', name, doc, attrs, (returns, args))
+
+    def interface(self, doc, attrs):
+        name = self.ident()
+        members = []
+        self.expect('{')
+        while not self.accept('}'):
+            members.append(self.member())
+        self.expect(';')
+        return ('interface', name, doc, attrs, members)
+
+    def parse(self):
+        namespaces = []
+        while self.peek().kind != 'eof':
+            doc = self.peek().doc
+            attrs = self.ext_attrs()
+            namespaces.append(self.namespace(doc, attrs))
+        return namespaces
+
+# Extended attributes that carry over to the schema, with their JSON names.
+_ATTRS = {
+    'nodoc': 'nodoc',
+    'deprecated': 'deprecated',
+    'instanceOf': 'isInstanceOf',
+    'instanceof': 'isInstanceOf',
+    'maxListeners': 'maxListeners',
+    'supportsFilters': 'supportsFilters',
+}
+
+def _copy_attrs(attrs, schema):
+    for (key, value) in attrs.items():
+        if key in _ATTRS:
+            if value == 'true':
+                value = True
+            schema[_ATTRS[key]] = value
+
+class _Converter(object):
+    def __init__(self, ns):
+        self.callbacks = {}
+        for definition in ns['definitions']:
+            if definition[0] == 'callback':
+                self.callbacks[definition[1]] = definition
+
+    def type_schema(self, t, attrs=None):
+        (kind, value) = t
+        if kind == 'array':
+            return collections.OrderedDict([('type', 'array'), ('items', self.type_schema(value))])
+        if kind == 'union':
+            return collections.OrderedDict([('choices', [ self.type_schema(c) for (c, optional) in value ])])
+
+        schema = collections.OrderedDict()
+        if value in _BASIC_TYPES:
+            schema['type'] = _BASIC_TYPES[value]
+        elif value == 'object':
+            schema['type'] = 'object'
+            if not attrs or not ('instanceOf' in attrs or 'instanceof' in attrs):
+                schema['additionalProperties'] = collections.OrderedDict([('type', 'any')])
+        elif value == 'ArrayBuffer':
+            schema['type'] = 'binary'
+            schema['isInstanceOf'] = 'ArrayBuffer'
+        elif value in self.callbacks:
+            (_, name, doc, cb_attrs, (returns, args)) = self.callbacks[value]
+            schema['type'] = 'function'
+            self.add_function(schema, doc, returns, args)
+        else:
+            schema['$ref'] = value
+        return schema
+
+    # Fills in the description, parameters and return value of a function.
+    def add_function(self, schema, doc, returns, args):
+        (description, param_docs) = process_comment(doc or '')
+        if description and 'description' not in schema:
+            schema['description'] = description
+
+        params = []
+        for (name, t, optional, attrs) in args:
+            param = collections.OrderedDict([('name', name)])
+            param.update(self.type_schema(t, attrs))
+            if optional:
+                param['optional'] = True
+            if name in param_docs:
+                param['description'] = param_docs[name]
+            _copy_attrs(attrs, param)
+            params.append(param)
+        schema['parameters'] = params
+
+        if returns != ('named', 'void'):
+            schema['returns'] = self.type_schema(returns)
+
+    def function(self, member):
+        schema = collections.OrderedDict([('name', member['name']), ('type', 'function')])
+        self.add_function(schema, member['doc'], member['type'], member['args'] or [])
+        _copy_attrs(member['attrs'], schema)
+        return schema
+
+    def dictionary(self, name, doc, attrs, members):
+        schema = collections.OrderedDict([('id', name), ('type', 'object')])
+        if doc:
+            schema['description'] = process_comment(doc)[0]
+        properties = collections.OrderedDict()
+        for member in members:
+            if member['args'] is not None:
+                prop = self.function(member)
+                del prop['name']
+            else:
+                prop = self.type_schema(member['type'], member['attrs'])
+                if member['optional']:
+                    prop['optional'] = True
+                if member['doc']:
+                    prop['description'] = process_comment(member['doc'])[0]
+                _copy_attrs(member['attrs'], prop)
+            properties[member['name']] = prop
+        schema['properties'] = properties
+        _copy_attrs(attrs, schema)
+        return schema
+
+    def enum(self, name, doc, attrs, values):
+        schema = collections.OrderedDict([('id', name), ('type', 'string')])
+        if doc:
+            schema['description'] = process_comment(doc)[0]
+        if any(value_doc for (value, value_doc) in values):
+            schema['enum'] = [ collections.OrderedDict([
+                                   ('name', value),
+                                   ('description', process_comment(value_doc or '')[0])])
+                               for (value, value_doc) in values ]
+        else:
+            schema['enum'] = [ value for (value, value_doc) in values ]
+        _copy_attrs(attrs, schema)
+        return schema
+
+    def namespace(self, ns):
+        schema = collections.OrderedDict([('namespace', ns['name'])])
+        if ns['doc']:
+            schema['description'] = process_comment(ns['doc'])[0]
+        _copy_attrs(ns['attrs'], schema)
+
+        types = []
+        functions = []
+        events = []
+        properties = collections.OrderedDict()
+        for (kind, name, doc, attrs, body) in ns['definitions']:
+            if kind == 'dictionary':
+                types.append(self.dictionary(name, doc, attrs, body))
+            elif kind == 'enum':
+                types.append(self.enum(name, doc, attrs, body))
+            elif kind == 'interface' and name == 'Functions':
+                functions.extend(self.function(member) for member in body)
+            elif kind == 'interface' and name == 'Events':
+                events.extend(self.function(member) for member in body)
+            elif kind == 'interface' and name == 'Properties':
+                for member in body:
+                    prop = self.type_schema(member['type'], member['attrs'])
+                    if member['doc']:
+                        prop['description'] = process_comment(member['doc'])[0]
+                    properties[member['name']] = prop
+
+        if types:
+            schema['types'] = types
+        if properties:
+            schema['properties'] = properties
+        if functions:
+            schema['functions'] = functions
+        if events:
+            schema['events'] = events
+        return schema
+
+def parse(text, filename='<idl>'):
+    namespaces = _Parser(tokenize(text, filename), filename).parse()
+    return [ _Converter(ns).namespace(ns) for ns in namespaces ]
@@ -0,0 +1,122 @@
+# Opt-in timing and counters for json-transform.py and upload.py.
+#
+# Code marks work with `with instrument.span(category, name, schema=...):`
+# and counts things with instrument.count(name, n). Nothing is recorded
+# until enable() is called; until then span() hands back one shared object
+# that does nothing. What was recorded can be written as a Chrome
+# trace-event file, for chrome://tracing or Perfetto, and summarised as a
+# table.
+
+import os
+import sys
+import json
+import time
+import threading
+import collections
+
+enabled = False
+
+_events = []
+_counters = collections.Counter()
+_lock = threading.Lock()
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span(object):
+    __slots__ = ('cat', 'name', 'args', 'start')
+
+    def __init__(self, cat, name, args):
+        self.cat = cat
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.time()
+        event = {
+            'name': self.name, 'cat': self.cat, 'ph': 'X',
+            'ts': int(self.start * 1e6), 'dur': int((end - self.start) * 1e6),
+            'pid': os.getpid(), 'tid': threading.current_thread().ident,
+        }
+        if self.args:
+            event['args'] = self.args
+        with _lock:
+            _events.append(event)
+        return False
+
+def enable():
+    global enabled
+    enabled = True
+
+def span(cat, name, **args):
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(cat, name, args)
+
+def count(name, n=1):
+    if enabled:
+        with _lock:
+            _counters[name] += n
+
+# Hands over what this process recorded and forgets it, so a worker process
+# can send its events to the parent.
+def drain():
+    global _events, _counters
+    with _lock:
+        recorded = (_events, dict(_counters))
+        _events = []
+        _counters = collections.Counter()
+    return recorded
+
+def merge(recorded):
+    (events, counters) = recorded
+    with _lock:
+        _events.extend(events)
+        _counters.update(counters)
+
+def write_trace(path):
+    with _lock:
+        trace = {'traceEvents': list(_events), 'otherData': dict(_counters)}
+    out = open(path, 'w')
+    json.dump(trace, out, separators=(',', ':'))
+    out.close()
+
+def _table(title, rows, out):
+    print >>out, '{:<32} {:>8} {:>10} {:>10} {:>10}'.format(title, 'count', 'total s', 'mean ms', 'max ms')
+    for (key, durations) in rows:
+        total = sum(durations) / 1e6
+        print >>out, '{:<32} {:>8} {:>10.3f} {:>10.2f} {:>10.2f}'.format(
+            key, len(durations), total, total * 1e3 / len(durations), max(durations) / 1e3)
+
+# Time spent in each category of span, the schema files that took longest,
+# and the counters.
+def print_summary(out=sys.stderr, top=10):
+    by_cat = collections.OrderedDict()
+    by_schema = collections.defaultdict(list)
+    with _lock:
+        for event in _events:
+            by_cat.setdefault(event['cat'], []).append(event['dur'])
+            schema = event.get('args', {}).get('schema')
+            if schema is not None and event['cat'].startswith('render'):
+                by_schema[schema].append(event['dur'])
+        counters = sorted(_counters.items())
+
+    _table('stage', sorted(by_cat.items()), out)
+    if by_schema:
+        print >>out
+        slowest = sorted(by_schema.items(), key=lambda item: -sum(item[1]))[:top]
+        _table('schema (rendering)', slowest, out)
+    if counters:
+        print >>out
+        for (name, value) in counters:
+            print >>out, '{:<32} {:>12}'.format(name, value)
@@ -0,0 +1,65 @@
+# Text preprocessing applied to Chromium's schema files before they are
+# parsed: inline $(ref:...) links become WebExtAPIRef macros, $(topic:...)
+# links are replaced by their text, and // comments are removed from JSON.
+#
+# The text is scanned once with a precompiled pattern. JSON string literals
+# are matched as whole tokens, so "//" inside a string is never taken for a
+# comment.
+
+import re
+
+_REFERENCE = re.compile(r'''
+    \$\(ref:(?P<ref>[^)]*)\)
+  | <a\ href='\$\(topic:(?P<topic>.*?)\)'>(?P<topic_text>.*?)</a>
+''', re.VERBOSE)
+
+# Anything that may need rewriting: a reference, or a "//" that starts a
+# comment unless it turns out to be inside a string literal.
+_JSON = re.compile(r'''
+    //[^\n]*
+  | \$\(ref:(?P<ref>[^)]*)\)
+  | <a\ href='\$\(topic:(?P<topic>.*?)\)'>(?P<topic_text>.*?)</a>
+''', re.VERBOSE)
+
+# Code up to the end of a line or the start of a // comment. String literals
+# are matched whole, so "//" inside a string is not a comment.
+_JSON_CODE = re.compile(r'(?:[^"/\n]|"(?:[^"\\\n]|\\.)*"|/(?!/))*')
+
+def _convert_reference(match):
+    link_text = match.group('ref')
+    if link_text is None:
+        # Links inside the topic text are converted too.
+        return convert_references(match.group('topic_text'))
+
+    components = link_text.split('.')
+    if len(components) > 2:
+        link_target = components[0] + "." + components[1]
+        remainder = components[2:]
+        return "{{{{WebExtAPIRef('{}', '{}', '{}')}}}}".format(link_target, link_target, remainder)
+    return "{{{{WebExtAPIRef('{}')}}}}".format(link_text)
+
+# Converts $(ref:<name>) to {{WebExtAPIRef(name)}} and replaces
+# <a href='$(topic:<name>)'>text</a> with its text.
+def convert_references(text):
+    if '$(' not in text:
+        return text
+    return _REFERENCE.sub(_convert_reference, text)
+
+def _convert_json(match):
+    if match.group(0)[0] != '/':
+        return _convert_reference(match)
+
+    text = match.string
+    start = match.start()
+    line_start = text.rfind('\n', 0, start) + 1
+    code_end = _JSON_CODE.match(text, line_start).end()
+    if code_end <= start:
+        return ''
+
+    # The "//" is inside a string; keep the line up to any real comment.
+    return convert_references(text[start:code_end])
+
+# Prepares the text of a JSON schema for json.loads. Comments are removed
+# but their lines are kept, so parse errors report the right line number.
+def preprocess_json(text):
+    return _JSON.sub(_convert_json, text)
@@ -0,0 +1,245 @@
+# A local web server for looking at generated pages without building the
+# whole tree or uploading to the staging wiki.
+#
+# Run as:
+# python preview.py data/ [--port 8000] [name ...]
+#
+# and open http://localhost:8000/tabs/query or http://localhost:8000/tabs/INDEX.
+# Pages are rendered when they are asked for, by the same code that
+# json-transform.py uses, and cached until their schema file changes. The
+# KumaScript macros that MDN would expand are replaced by simple local
+# stand-ins, and WebExtAPIRef links point at other preview pages.
+
+import os
+import re
+import cgi
+import sys
+import argparse
+import traceback
+import collections
+import BaseHTTPServer
+
+import transform
+
+# Number of rendered pages kept in memory.
+CACHE_SIZE = 256
+
+_MACRO = re.compile(r'\{\{\s*(\w+)\s*(?:\((.*?)\))?\s*\}\}')
+_STRING = re.compile(r'''['"]([^'"]*)['"]''')
+
+# Where a link from a page of the namespace `ns_name` leads: the page that
+# json-transform.py --format html would link to.
+def page_link(build, name, ns_name):
+    return '/' + transform.ref_slug(build, name, ns_name)
+
+# `page_link` gives the URL of a name. Any text after the name is the link's
+# label.
+def link_macro(args, page_link, embed=False):
+    name = args[0] if args else ''
+    (target, space, label) = name.partition(' ')
+    link = '<a href="{}"><code>{}</code></a>'.format(page_link(name), cgi.escape(label or target))
+    if embed:
+        return '<p class="embed">See {}.</p>'.format(link)
+    return link
+
+# Local stand-ins for the macros, given the macro's string arguments. The
+# link macros are added by expand_macros().
+MACROS = {
+    'optional_inline': lambda args: ' <em>(optional)</em>',
+    'AddonSidebar': lambda args: '',
+    'WebExtExamples': lambda args: '',
+    'WebExtChromeCompat': lambda args: '',
+    'CompatibilityTable': lambda args: '',
+    'CompatVersionUnknown': lambda args: 'Yes',
+    'CompatUnknown': lambda args: '?',
+    'CompatNo': lambda args: 'No',
+    'CompatGeckoDesktop': lambda args: args[0] if args else 'Yes',
+    'CompatOpera': lambda args: args[0] if args else 'Yes',
+}
+
+def expand_macros(body, page_link):
+    macros = dict(MACROS,
+                  WebExtAPIRef=lambda args: link_macro(args, page_link),
+                  WebExtAPIEmbedType=lambda args: link_macro(args, page_link, embed=True))
+
+    def expand(match):
+        macro = macros.get(match.group(1))
+        if macro is None:
+            return '<code>{}</code>'.format(cgi.escape(match.group(0)))
+        return macro(_STRING.findall(match.group(2) or ''))
+    return _MACRO.sub(expand, body)
+
+PAGE = u'''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; max-width: 60em; margin: 1em auto; }}
+pre {{ background: #eee; padding: 0.5em; }}
+.hidden {{ display: none; }}
+.note, .embed {{ background: #eef; padding: 0.5em; }}
+</style>
+</head>
+<body>
+<p><a href="/">All namespaces</a> &gt; <a href="/{namespace}/INDEX">{namespace}</a></p>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+'''
+
+class Preview(object):
+    def __init__(self, build, names):
+        self.build = build
+        self.names = names
+        # Maps each page slug to its schema file and render task.
+        self.routes = {}
+        # Maps each schema file to (mtime, size, digest) of what was loaded.
+        self.loaded = {}
+        self.cache = collections.OrderedDict()
+        for name in names:
+            self.load(name)
+
+    def file_state(self, name):
+        st = os.stat(transform.schema_path(self.build.in_dir, name))
+        return (st.st_mtime, st.st_size)
+
+    def load(self, name):
+        build = self.build
+        path = transform.schema_path(build.in_dir, name)
+        # The acknowledgement links every page to its source file.
+        build.json_sources.setdefault(name, transform.LINK1)
+        state = self.file_state(name)
+        digest = transform.file_hash(path)
+
+        for slug in [ slug for (slug, (n, task)) in self.routes.items() if n == name ]:
+            del self.routes[slug]
+        transform.forget_schema(build, name)
+        try:
+            tasks = transform.page_tasks(build, name)
+        except Exception:
+            print >>sys.stderr, 'Failed to read {}:'.format(path)
+            print >>sys.stderr, traceback.format_exc()
+            tasks = []
+        # When several pages share a slug, the last one written wins.
+        for (slug, task) in tasks:
+            self.routes[slug] = (name, task)
+        self.loaded[name] = state + (digest,)
+
+        # Other schemas may embed this one's types or link to its pages, so
+        # every rendered page is stale.
+        if build.symbol_index is not None and len(self.loaded) == len(self.names):
+            (build.symbol_index, unparsed) = transform.build_symbol_index(build)
+            self.cache.clear()
+
+    # Reloads a schema file if it changed since it was loaded. The digest
+    # is only computed when the file's size or mtime changed.
+    def refresh(self, name):
+        state = self.file_state(name)
+        if state != self.loaded[name][:2]:
+            digest = transform.file_hash(transform.schema_path(self.build.in_dir, name))
+            if digest != self.loaded[name][2]:
+                self.load(name)
+            else:
+                self.loaded[name] = state + (digest,)
+
+    def render(self, slug):
+        if slug not in self.routes:
+            # The page may belong to a schema that has changed since.
+            for name in self.names:
+                self.refresh(name)
+            if slug not in self.routes:
+                return None
+        (name, task) = self.routes[slug]
+        self.refresh(name)
+        if slug not in self.routes:
+            return None
+        (name, task) = self.routes[slug]
+
+        key = (slug, self.loaded[name][2])
+        html = self.cache.pop(key, None)
+        if html is None:
+            html = self.render_page(slug, task)
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.popitem(last=False)
+        self.cache[key] = html
+        return html
+
+    def render_page(self, slug, task):
+        build = self.build
+        pages = []
+        sink = build.page_sink
+        build.page_sink = pages.append
+        try:
+            transform.run_task(build, task)
+        finally:
+            build.page_sink = sink
+        (slug, head, body) = pages[-1].record()
+        if isinstance(body, str):
+            body = body.decode('utf-8')
+        ns_name = slug.split('/')[0]
+        return PAGE.format(title=cgi.escape(head['title']), namespace=ns_name,
+                           body=expand_macros(body, lambda name: page_link(build, name, ns_name)))
+
+    def index(self):
+        namespaces = sorted(set(slug.split('/')[0] for slug in self.routes))
+        items = [ u'<li><a href="/{0}/INDEX">{0}</a></li>'.format(ns) for ns in namespaces ]
+        return PAGE.format(title='WebExtensions API', namespace='', body=u'<ul>\n{}\n</ul>'.format('\n'.join(items)))
+
+class PreviewHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    preview = None
+
+    def do_GET(self):
+        path = self.path.split('?')[0].strip('/')
+        try:
+            if not path:
+                html = self.preview.index()
+            else:
+                html = self.preview.render(path)
+        except Exception:
+            self.send_text(500, traceback.format_exc())
+            return
+        if html is None:
+            self.send_text(404, 'No page {}\n'.format(path))
+            return
+        self.send(200, 'text/html; charset=utf-8', html.encode('utf-8'))
+
+    def send_text(self, status, text):
+        self.send(status, 'text/plain; charset=utf-8', text)
+
+    def send(self, status, content_type, content):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve generated pages for preview.')
+    parser.add_argument('in_dir')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='schema files to serve (default: all of them)')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--embed-types', action='store_true',
+                        help='describe referenced types in place, as json-transform.py --embed-types does')
+    args = parser.parse_args()
+
+    build = transform.Build(args.in_dir)
+    build.descriptions.size = transform.DESCRIPTION_CACHE_SIZE
+    names = args.names or transform.schema_names(args.in_dir)
+    build.embed_types = args.embed_types
+    # Links lead to the pages of whatever they name in in_dir.
+    (build.symbol_index, unparsed) = transform.build_symbol_index(build)
+
+    PreviewHandler.preview = Preview(build, names)
+
+    server = BaseHTTPServer.HTTPServer(('localhost', args.port), PreviewHandler)
+    print 'Serving {} pages at http://localhost:{}/'.format(len(PreviewHandler.preview.routes), args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
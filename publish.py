@@ -0,0 +1,149 @@
+# Generates pages and uploads them to MDN as they are generated, without
+# writing them to an output directory first.
+#
+# Run as:
+# python publish.py data/ <your-mdn-key-id> <mdn-secret> tabs windows ...
+#
+# Pages go from the generator to the upload threads through a bounded
+# queue, so rendering overlaps with uploading and at most --queue-size pages
+# wait in memory. A page's parent must exist before it is created, so each
+# namespace's INDEX page is generated first, and the namespace's other pages
+# wait until it has been uploaded.
+
+import sys
+import time
+import Queue
+import argparse
+import threading
+
+import transform
+import upload
+import instrument
+
+QUEUE_SIZE = 64
+
+# Tells an upload thread that there are no more pages.
+_DONE = None
+
+class Pipeline(object):
+    def __init__(self, client, queue_size=QUEUE_SIZE):
+        self.client = client
+        self.queue = Queue.Queue(queue_size)
+        self.results = []
+        self.lock = threading.Lock()
+        # One event per namespace, set once its INDEX page has been uploaded.
+        self.parents = {}
+        self.generated = 0
+        # Time the generator spent waiting for room in the queue, and the
+        # upload threads spent waiting for pages, in total.
+        self.generate_wait = 0.0
+        self.upload_wait = 0.0
+        self.threads = [ threading.Thread(target=self.upload_pages)
+                         for i in range(client.config.concurrency) ]
+        for thread in self.threads:
+            thread.daemon = True
+
+    def start(self):
+        self.start_time = time.time()
+        for thread in self.threads:
+            thread.start()
+
+    # Takes each page from the generator.
+    def add(self, slug, head, body):
+        (ns, name) = slug.split('/')
+        if name == 'INDEX':
+            self.parents.setdefault(ns, threading.Event())
+        start = time.time()
+        self.queue.put((ns, name, head, body))
+        self.generate_wait += time.time() - start
+        self.generated += 1
+
+    def upload_pages(self):
+        while True:
+            start = time.time()
+            page = self.queue.get()
+            with self.lock:
+                self.upload_wait += time.time() - start
+            if page is _DONE:
+                return
+
+            (ns, name, head, body) = page
+            if name != 'INDEX':
+                parent = self.parents.get(ns)
+                if parent is not None:
+                    parent.wait()
+            try:
+                result = self.client.upload_page(ns, name, head, body)
+            except Exception as e:
+                result = (ns + '/' + name, None, '{}: {}'.format(e.__class__.__name__, e))
+            finally:
+                if name == 'INDEX':
+                    self.parents[ns].set()
+            with self.lock:
+                self.results.append(result)
+
+    # Waits for the pages in the queue to be uploaded, once the generator
+    # has finished or failed, and returns a (slug, status, error) result
+    # for each page.
+    def finish(self):
+        self.generate_time = time.time() - self.start_time
+        for thread in self.threads:
+            self.queue.put(_DONE)
+        for thread in self.threads:
+            thread.join()
+        self.wall = time.time() - self.start_time
+        return self.results
+
+    def print_throughput(self):
+        rate = len(self.results) / self.wall if self.wall else 0
+        print '{} pages generated in {:.2f}s and uploaded in {:.2f}s, {:.1f} pages/s end to end'.format(
+            self.generated, self.generate_time, self.wall, rate)
+        idle = self.upload_wait / (len(self.threads) * self.wall) if self.wall else 0
+        print 'The generator waited {:.2f}s for uploads; upload threads waited {:.0%} of the time for pages'.format(
+            self.generate_wait, idle)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate pages and upload them to MDN as they are generated.')
+    parser.add_argument('in_dir')
+    parser.add_argument('user')
+    parser.add_argument('passwd')
+    parser.add_argument('names', nargs='*', metavar='name')
+    transform.add_arguments(parser)
+    upload.add_arguments(parser, ledger_location='the current directory')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help='pages that may wait for an upload thread (default: %(default)s)')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record how long each stage, page and request takes, write a Chrome trace '
+                             'to FILE and print a summary')
+    args = parser.parse_args(argv)
+
+    config = transform.config_from_args(parser, args)
+    config.index_first = True
+    ledger_path = args.ledger or upload.LEDGER
+    if args.trace:
+        instrument.enable()
+
+    client = upload.start_run(upload.config_from_args(args), ledger_path, args.force)
+    pipeline = Pipeline(client, args.queue_size)
+    pipeline.start()
+    try:
+        result = transform.generate(args.names, args.in_dir, pipeline, config)
+    finally:
+        results = pipeline.finish()
+        upload.finish_run(client, ledger_path)
+        if args.trace:
+            instrument.write_trace(args.trace)
+
+    transform.print_cache_stats(result)
+    if args.error_report:
+        transform.write_error_report(args.error_report, result)
+    failures = upload.print_summary(results, client)
+    pipeline.print_throughput()
+    if args.trace:
+        instrument.print_summary(sys.stdout)
+    if transform.print_result(result) or failures:
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# Flow control for uploads to a shared wiki: a token bucket that caps the
+# request rate, a concurrency limit that adapts to how the server is coping,
+# and latency statistics for the run.
+
+import time
+import threading
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = int(round(p / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+# Allows `rate` requests per second on average, and bursts of up to `burst`
+# requests after a quiet spell.
+class TokenBucket(object):
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst else max(1, rate))
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Caps the number of requests in flight, and moves the cap between
+# `minimum` and `maximum` by additive increase, multiplicative decrease.
+# After every `window` responses the cap goes up by one if the window was
+# healthy. It goes down by one if the window's p95 latency rose above
+# `latency_factor` times the best p95 seen. It is halved as soon as the
+# server answers 429 or fails, at most once per window, since the requests
+# already in flight will see the same.
+class AdaptiveConcurrency(object):
+    def __init__(self, initial, maximum, minimum=1, window=20, latency_factor=2.0):
+        self.limit = initial
+        self.peak = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.latencies = []
+        self.best_p95 = None
+        self.since_decrease = window
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    # `ok` is False for a 429, a 5xx or a network error.
+    def release(self, latency, ok):
+        with self.condition:
+            self.in_flight -= 1
+            self.since_decrease += 1
+            if not ok:
+                if self.since_decrease >= self.window:
+                    self.set_limit(self.limit // 2)
+                self.latencies = []
+            else:
+                self.latencies.append(latency)
+                if len(self.latencies) >= self.window:
+                    self.adjust(percentile(sorted(self.latencies), 95))
+                    self.latencies = []
+            self.condition.notify_all()
+
+    def adjust(self, p95):
+        if self.best_p95 is None or p95 < self.best_p95:
+            self.best_p95 = p95
+        if p95 > self.best_p95 * self.latency_factor:
+            self.set_limit(self.limit - 1)
+        else:
+            self.set_limit(self.limit + 1)
+
+    def set_limit(self, limit):
+        limit = max(self.minimum, min(self.maximum, limit))
+        if limit < self.limit:
+            self.since_decrease = 0
+        self.limit = limit
+        self.peak = max(self.peak, limit)
+
+# Latency and outcome of every request in a run.
+class Telemetry(object):
+    def __init__(self):
+        self.latencies = []
+        self.throttled = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency, status):
+        with self.lock:
+            self.latencies.append(latency)
+            if status == 429:
+                self.throttled += 1
+            elif status is None or status >= 500:
+                self.failed += 1
+
+    def summary(self):
+        values = sorted(self.latencies)
+        if not values:
+            return 'No requests made'
+        parts = [ 'p{} {:.3f}s'.format(p, percentile(values, p)) for p in (50, 90, 95, 99) ]
+        return '{} requests, latency {}, max {:.3f}s; {} throttled, {} failed'.format(
+            len(values), ', '.join(parts), values[-1], self.throttled, self.failed)
@@ -0,0 +1,142 @@
+# An on-disk cache of rendered pages, for json-transform.py --render-cache.
+#
+# Entries are keyed by a hash of everything that goes into a page: the
+# schema nodes it is rendered from and the generator itself. The same key
+# always gives the same page, so a cache directory can be kept between
+# builds, shared by checkouts of different branches, and used by several
+# builders at once. Entries are written to a temporary file and renamed into
+# place, and carry a checksum, so a reader never sees half an entry. Hits
+# touch the entry's mtime, and trim() removes the least recently used
+# entries once the directory grows past its size limit.
+#
+# A cache can sit in front of a shared one, such as a directory on a network
+# file system that CI workers all mount: misses are looked up there, and
+# entries are written to both.
+
+import os
+import time
+import errno
+import hashlib
+import tempfile
+
+# Entries are spread over 256 subdirectories named after the first two
+# characters of their key.
+_FANOUT = 2
+
+# trim() removes entries until the cache is this fraction of its limit, so
+# that the next few builds do not each have to trim again.
+_LOW_WATER = 0.9
+
+# Temporary files older than this were left by a builder that died.
+_ORPHAN_AGE = 3600
+
+class RenderCache(object):
+    def __init__(self, path, max_bytes, shared=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:_FANOUT], key[_FANOUT:])
+
+    def _read(self, key):
+        path = self.entry_path(key)
+        try:
+            data = open(path, 'rb').read()
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+        (checksum, sep, value) = data.partition('\n')
+        if not sep or hashlib.sha1(value).hexdigest() != checksum:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def get(self, key):
+        value = self._read(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self._write(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _write(self, key, value):
+        path = self.entry_path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, prefix='.')
+        try:
+            out = os.fdopen(fd, 'wb')
+            out.write(hashlib.sha1(value).hexdigest())
+            out.write('\n')
+            out.write(value)
+            out.close()
+            os.rename(tmp_path, path)
+        except:
+            self._remove(tmp_path)
+            raise
+
+    def put(self, key, value):
+        self._write(key, value)
+        if self.shared is not None:
+            self.shared.put(key, value)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    # Removes the least recently used entries if the cache is over its
+    # limit, and returns the number removed. Other builders may be removing
+    # entries at the same time.
+    def trim(self):
+        entries = []
+        total = 0
+        now = time.time()
+        for (directory, dirs, files) in os.walk(self.path):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if filename.startswith('.'):
+                    if st.st_mtime < now - _ORPHAN_AGE:
+                        self._remove(path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        removed = 0
+        if total > self.max_bytes:
+            entries.sort()
+            for (mtime, size, path) in entries:
+                if total <= self.max_bytes * _LOW_WATER:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+
+        if self.shared is not None:
+            removed += self.shared.trim()
+        return removed
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,112 @@
+# Parsed schemas kept on disk, so that a run reads each schema file's model
+# back instead of preprocessing and parsing it again.
+#
+# There is one file per schema file, holding a stamp and the pickled model.
+# The stamp gives the mtime, size and SHA-1 of the schema file it was built
+# from, and the version of the code that built it. An entry is used if the
+# mtime and size still match, or if they do not but the contents do, as
+# after a fresh checkout; in that case the stamp is brought up to date.
+# Entries are written to a temporary file and renamed into place, so
+# several runs can share a cache.
+
+import os
+import gc
+import errno
+import hashlib
+import tempfile
+import cPickle
+import contextlib
+
+class SchemaCache(object):
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, name):
+        return os.path.join(self.path, name + '.pickle')
+
+    # The stamp of a schema file whose contents are `data`, given its stat
+    # from before it was read.
+    def stamp(self, st, data):
+        return {
+            'version': self.version,
+            'mtime': st.st_mtime,
+            'size': st.st_size,
+            'hash': hashlib.sha1(data).hexdigest(),
+        }
+
+    # The model cached for `source`, or None.
+    def get(self, name, source):
+        try:
+            f = open(self.entry_path(name), 'rb')
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            self.misses += 1
+            return None
+
+        with f:
+            try:
+                stamp = cPickle.load(f)
+                st = os.stat(source)
+                if stamp['version'] != self.version:
+                    model = None
+                elif stamp['mtime'] == st.st_mtime and stamp['size'] == st.st_size:
+                    with gc_paused():
+                        model = cPickle.load(f)
+                else:
+                    data = open(source, 'rb').read()
+                    if stamp['hash'] != hashlib.sha1(data).hexdigest():
+                        model = None
+                    else:
+                        with gc_paused():
+                            model = cPickle.load(f)
+                        self.put(name, self.stamp(st, data), model)
+            # A damaged entry is parsed again and replaced.
+            except Exception:
+                model = None
+
+        if model is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return model
+
+    # Does nothing if the cache directory cannot be written to, such as in a
+    # read-only checkout.
+    def put(self, name, stamp, model):
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return
+        try:
+            (fd, tmp_path) = tempfile.mkstemp(dir=self.path, prefix='.' + name + '.')
+        except OSError:
+            return
+        try:
+            out = os.fdopen(fd, 'wb')
+            cPickle.dump(stamp, out, cPickle.HIGHEST_PROTOCOL)
+            cPickle.dump(model, out, cPickle.HIGHEST_PROTOCOL)
+            out.close()
+            os.rename(tmp_path, self.entry_path(name))
+        except:
+            os.remove(tmp_path)
+            raise
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+# Parsing a schema creates many objects that all stay alive, so collecting
+# garbage while it happens only costs time.
+@contextlib.contextmanager
+def gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
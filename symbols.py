@@ -0,0 +1,210 @@
+# Index of every symbol defined by a set of schema files.
+#
+# Symbols are keyed by their fully-qualified name, such as "tabs.Tab",
+# "tabs.query", "tabs.onUpdated" or "runtime.lastError". The index is built
+# once from all the schemas in data/, so that references from one namespace
+# to another (windows to tabs.Tab, say) can be resolved with a dictionary
+# lookup, and references to things that do not exist are reported at build
+# time rather than found on the published wiki.
+
+import re
+import json
+import hashlib
+
+# Inline links have already been turned into macros by preprocess.py.
+_INLINE_REF = re.compile(r"""\{\{WebExtAPIRef\('([^']*)'""")
+
+class Symbol(object):
+    __slots__ = ('name', 'kind', 'node', 'namespace', 'json_name')
+
+    def __init__(self, name, kind, node, namespace):
+        self.name = name
+        self.kind = kind
+        self.node = node
+        self.namespace = namespace
+        self.json_name = namespace.json_name
+
+    def __repr__(self):
+        return '<Symbol {} {}>'.format(self.kind, self.name)
+
+# A reference that does not resolve. `where` is the symbol whose page holds
+# it, `ref` is the name it refers to and `kind` is '$ref' or 'link'.
+class BrokenRef(object):
+    __slots__ = ('json_name', 'where', 'ref', 'kind')
+
+    def __init__(self, json_name, where, ref, kind):
+        self.json_name = json_name
+        self.where = where
+        self.ref = ref
+        self.kind = kind
+
+# The top-level definitions of a namespace, as (kind, full name, node).
+# Some schemas give types ids that already include the namespace.
+def definitions(ns):
+    def qualify(name):
+        if name.startswith(ns.name + '.'):
+            return name
+        return ns.name + '.' + name
+
+    for func in ns.functions or []:
+        yield ('function', qualify(func.name), func)
+    for event in ns.events or []:
+        yield ('event', qualify(event.name), event)
+    for t in ns.types or []:
+        yield ('type', qualify(t.id), t)
+    for prop in ns.properties or []:
+        yield ('property', qualify(prop.name), prop)
+
+# Every node under `node`, including itself.
+def walk(node):
+    yield node
+    for child in node.choices or []:
+        for n in walk(child):
+            yield n
+    if node.items is not None:
+        for n in walk(node.items):
+            yield n
+    for child in node.properties or []:
+        for n in walk(child):
+            yield n
+    for child in node.parameters or []:
+        for n in walk(child):
+            yield n
+    for child in getattr(node, 'extra_parameters', None) or []:
+        for n in walk(child):
+            yield n
+    if node.returns is not None:
+        for n in walk(node.returns):
+            yield n
+
+def descriptions(node):
+    if node.description:
+        yield node.description
+    for e in node.enum or []:
+        if type(e) != unicode and e.description:
+            yield e.description
+
+class SymbolIndex(object):
+    def __init__(self):
+        self.symbols = {}
+        self.namespaces = {}
+        # The full names of the symbols with each name, without the
+        # namespace.
+        self.short_names = {}
+
+    def add(self, namespaces):
+        for ns in namespaces:
+            self.namespaces[ns.name] = ns
+            for (kind, full_name, node) in definitions(ns):
+                # A name defined twice keeps its first definition, which is
+                # the page a serial run writes first.
+                if full_name not in self.symbols:
+                    self.symbols[full_name] = Symbol(full_name, kind, node, ns)
+                    short_name = full_name[len(ns.name) + 1:]
+                    self.short_names.setdefault(short_name, []).append(full_name)
+
+    # A name relative to the namespace `ns_name` is looked for there first.
+    def lookup(self, name, ns_name=None):
+        symbol = None
+        if ns_name is not None:
+            symbol = self.symbols.get(ns_name + '.' + name)
+        if symbol is None:
+            symbol = self.symbols.get(name)
+        return symbol
+
+    # The slug of the page an inline link or $ref points at, or None if it
+    # points at nothing documented. A link names a namespace, a symbol, or a
+    # member of a type such as "DownloadItem.filename", which is on the
+    # type's page. Links may be relative to the namespace they appear in,
+    # and anything after a space is link text.
+    def page(self, link, ns_name=None):
+        link = link.split(' ')[0].rstrip('()')
+        if link.startswith('chrome.') and link[7:] in self.namespaces:
+            link = link[7:]
+        if link in self.namespaces:
+            return link + '/INDEX'
+        symbol = self.lookup(link, ns_name)
+        # INDEX pages name a type whose id includes its namespace with the
+        # namespace twice, as in "declarativeWebRequest.declarativeWebRequest
+        # .RequestCookie".
+        if symbol is None:
+            parts = link.split('.')
+            for i in range(1, len(parts)):
+                prefix = '.'.join(parts[:i])
+                if prefix in self.namespaces and link.startswith(prefix + '.' + prefix + '.'):
+                    symbol = self.symbols.get(link[len(prefix) + 1:])
+                    break
+        if symbol is None and '.' in link:
+            symbol = self.lookup(link.rsplit('.', 1)[0], ns_name)
+            if symbol is not None and symbol.kind != 'type':
+                symbol = None
+        if symbol is None:
+            return None
+        if symbol.kind == 'type':
+            return symbol.namespace.name + '/' + symbol.node.id
+        return symbol.namespace.name + '/' + symbol.node.name
+
+    # Whether an inline link points at something documented.
+    def link_exists(self, link, ns_name):
+        return self.page(link, ns_name) is not None
+
+    # The page of the one symbol in any namespace that a link names without
+    # its namespace, such as "Device" for "usb.Device". None if no
+    # namespace defines the name, or if several do.
+    def page_elsewhere(self, link):
+        full_names = self.short_names.get(link.split(' ')[0].rstrip('()'), [])
+        if len(full_names) != 1:
+            return None
+        return self.page(full_names[0])
+
+    # Changes whenever a name comes or goes, or moves to another page, and
+    # so whenever page() may give a different answer.
+    def signature(self):
+        pages = sorted((name, self.page(name)) for name in self.symbols)
+        return hashlib.sha1(json.dumps([sorted(self.namespaces), pages])).hexdigest()
+
+    # Points every $ref under `namespaces` at the type it names, including
+    # types defined in other schema files. Targets are replaced, so that
+    # resolving again after a schema is reloaded drops its old nodes.
+    def resolve(self, namespaces):
+        for ns in namespaces:
+            for (kind, full_name, top) in definitions(ns):
+                for node in walk(top):
+                    if node.ref is not None:
+                        symbol = self.symbols.get(node.ref_name)
+                        if symbol is None or symbol.kind != 'type':
+                            node.target = None
+                        else:
+                            node.target = symbol.node
+
+    # References under `namespaces` that name nothing in the index.
+    def broken_refs(self, namespaces):
+        broken = []
+
+        def check_links(text, where, ns):
+            for link in _INLINE_REF.findall(text):
+                if not self.link_exists(link, ns.name):
+                    broken.append(BrokenRef(ns.json_name, where, link, 'link'))
+
+        for ns in namespaces:
+            if ns.description:
+                check_links(ns.description, ns.name, ns)
+            for (kind, where, top) in definitions(ns):
+                for node in walk(top):
+                    if node.ref is not None and node.ref_name not in self.symbols:
+                        broken.append(BrokenRef(ns.json_name, where, node.ref_name, '$ref'))
+                    for text in descriptions(node):
+                        check_links(text, where, ns)
+        return broken
+
+    # Schema files whose types are referenced from `namespaces`.
+    def dependencies(self, namespaces):
+        deps = set()
+        for ns in namespaces:
+            for (kind, full_name, top) in definitions(ns):
+                for node in walk(top):
+                    if node.ref is not None:
+                        symbol = self.symbols.get(node.ref_name)
+                        if symbol is not None and symbol.json_name != ns.json_name:
+                            deps.add(symbol.json_name)
+        return deps
@@ -0,0 +1,1707 @@
+# Generates MDN pages from Chromium's extension API schemas.
+#
+# This is the library behind json-transform.py. To generate pages from
+# other code:
+#
+#   import transform
+#   result = transform.generate(['tabs', 'windows'], 'data/', 'out',
+#                               transform.GenerateConfig(jobs=4))
+#
+# The output can also be any object with an add(slug, head, body) method,
+# such as a transform.Bundle. Each call parses the schemas it needs, or loads
+# them from the schema cache, and nothing is printed: what went wrong is in
+# the result, and print_result() reports it as json-transform.py does.
+
+import os
+import sys
+import json
+import os.path
+import collections
+import argparse
+import traceback
+import multiprocessing
+import hashlib
+import errno
+import tempfile
+import inspect
+import time
+
+import apimodel
+import idl_schema
+import preprocess
+import symbols
+import features
+import watcher
+import instrument
+import rendercache
+import schemacache
+import validate
+import backends
+
+LINK1 = 'https://chromium.googlesource.com/chromium/src/+/master/chrome/common/extensions/api/'
+LINK2 = 'https://chromium.googlesource.com/chromium/src/+/master/extensions/common/api/'
+
+JSON_SOURCES = {
+    'windows': LINK1,
+    'tabs': LINK1,
+    'extension': LINK1,
+    'bookmarks': LINK1,
+    'cookies': LINK1,
+    'i18n': LINK1,
+    'browser_action': LINK1,
+    'context_menus': LINK1,
+    'runtime': LINK2,
+    'idle': LINK2,
+    'storage': LINK2,
+    'web_navigation': LINK1,
+    'web_request': LINK2,
+    'extension_types': LINK2,
+    'events': LINK2,
+    'page_action': LINK1,
+    'alarms': LINK2,
+    'notifications': LINK1
+}
+
+CHROMIUM_DOCS = 'https://developer.chrome.com/extensions/'
+
+# Namespaces with more pages than this are sharded page by page in --jobs
+# mode; smaller schema files are handed to a worker as a whole.
+SHARD_PAGES = 32
+
+# Permissions for generated pages are the same as for open(path, 'w').
+_umask = os.umask(0)
+os.umask(_umask)
+
+# Build manifest written to the output directory by --incremental.
+MANIFEST = '.build-manifest.json'
+
+# The slug of the page that a name such as "tabs.query()", "tabs.Tab.url",
+# "AppWindow" or "runtime.Port onDisconnect" refers to, for backends that
+# link pages to each other. `ns_name` is the namespace the name appears in.
+# The symbol index says where everything in in_dir is, looking in that
+# namespace first. Descriptions also name things in other namespaces without
+# saying which, which is taken if only one namespace has such a thing. A
+# name the index does not know is taken to be "namespace.member", or a
+# namespace.
+def ref_slug(build, name, ns_name=None):
+    if build.symbol_index is not None:
+        slug = build.symbol_index.page(name, ns_name) or build.symbol_index.page_elsewhere(name)
+        if slug is not None:
+            return slug
+    name = name.split(' ')[0].rstrip('()')
+    if '.' not in name:
+        return name + '/INDEX'
+    return '/'.join(name.rsplit('.', 1))
+
+# Remembers what the describe_* functions returned. Their output depends
+# only on their arguments. A plain build describes most nodes once, so the
+# cache is off (size 0) unless pages describe the same nodes again: types
+# embedded on every page that uses them, or pages rendered over and over by
+# a long-running process. Model nodes are keyed by identity, which apimodel
+# shares between equal subtrees of a schema file, and kept alive by the
+# cache so their ids are not reused. Links in a description may be relative
+# to the namespace it is described from, so the key holds the namespace's
+# name. The cache must be cleared when a schema is parsed again.
+class DescriptionCache(object):
+    def __init__(self, size=0):
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, func, build, args):
+        if not self.size:
+            return func(build, *args)
+        key = (func.__name__,) + tuple(
+            a.name if isinstance(a, apimodel.Namespace) else
+            id(a) if isinstance(a, apimodel.Type) else a
+            for a in args)
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            entry = (args, func(build, *args))
+            if len(self.entries) >= self.size:
+                self.entries.popitem(last=False)
+        else:
+            self.hits += 1
+        self.entries[key] = entry
+        return entry[1]
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
+
+# Keeps what a describe_* function returns in its build's description cache.
+def memoize(func):
+    def cached(build, *args):
+        return build.descriptions.call(func, build, args)
+    cached.__name__ = func.__name__
+    return cached
+
+# Size of the description cache in processes that render pages repeatedly.
+DESCRIPTION_CACHE_SIZE = 10000
+
+# Default limit on the size of a --render-cache directory, in megabytes.
+RENDER_CACHE_MB = 256
+
+# Where json-transform.py keeps the parsed schemas of in_dir: in the user's
+# cache directory rather than next to the schemas, one directory for each
+# input directory, so that two checkouts never mistake each other's entries
+# for their own.
+def default_schema_cache(in_dir):
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    key = hashlib.sha1(os.path.abspath(in_dir)).hexdigest()[:16]
+    return os.path.join(root, 'webext-docs', 'schemas', key)
+
+# Everything a run of the generator works with: where schemas are read from
+# and pages go, how pages are written, and what has been loaded so far. Each
+# call to generate() makes its own, and every function that reads schemas or
+# renders pages is handed it.
+class Build(object):
+    __slots__ = ('in_dir', 'out_dir', 'page_sink', 'record_sink', 'backend',
+                 'embed_types', 'feature_set', 'symbol_index', 'descriptions',
+                 'render_cache', 'render_salt', 'schema_cache', 'index_first',
+                 'quarantined', 'json_sources', 'models', 'made_dirs')
+
+    def __init__(self, in_dir, format='mdn'):
+        self.in_dir = in_dir
+        self.out_dir = None
+        # Where finished pages go: files in out_dir, or records handed to
+        # record_sink.add(slug, head, body), such as a Bundle.
+        self.page_sink = lambda page: write_page_file(self, page)
+        self.record_sink = None
+        # How pages are written out, a backends.Backend.
+        self.backend = backends.BACKENDS[format](lambda name, ns_name: ref_slug(self, name, ns_name))
+        # Whether parameters that refer to a type get a summary of that type
+        # instead of a WebExtAPIEmbedType macro.
+        self.embed_types = False
+        # Chromium's feature files, read by --select to choose namespaces and
+        # to say which permissions each page needs.
+        self.feature_set = None
+        # Index of every symbol in in_dir, built by --check-refs and
+        # --embed-types, and for backends that link pages to each other.
+        self.symbol_index = None
+        self.descriptions = DescriptionCache()
+        # Rendered pages kept between runs, a rendercache.RenderCache or
+        # None. Pages are keyed by render_salt, which stands for the
+        # generator and its templates, and the schema nodes the page is
+        # rendered from.
+        self.render_cache = None
+        self.render_salt = None
+        # Parsed schemas kept between runs, a schemacache.SchemaCache or None.
+        self.schema_cache = None
+        # Whether each namespace's INDEX page is rendered before its other
+        # pages, for publish.py, which has to upload it first.
+        self.index_first = False
+        # Slugs of the pages that --keep-going set aside because of a
+        # problem in the schema they are built from.
+        self.quarantined = set()
+        # Source links for the acknowledgement, which --select adds to.
+        self.json_sources = dict(JSON_SOURCES)
+        # Parsed schemas, keyed by schema file name.
+        self.models = {}
+        # Namespace directories already created.
+        self.made_dirs = set()
+
+def get_common_tags(out, namespace):
+    common_tags = 'API, Reference, WebExtensions, Add-ons, Extensions, Non-standard, '
+    common_tags += '{}, '.format(namespace)
+    return common_tags
+
+def get_api_tags(out, namespace):
+    tags = '"tags": "'
+    tags += get_common_tags(out, namespace)
+    tags += '{}"'.format('Interface')
+    return tags
+
+def get_api_component_tags(out, namespace, name, component_type):
+    tags = '"tags": "'
+    tags += get_common_tags(out, namespace)
+    tags += '{}, '.format(name)
+    tags += '{}"'.format(component_type)
+    return tags
+
+def describe_anonymous_objects(build, ns, anonymous_objects, out):
+    if len(anonymous_objects) == 0:
+        return
+    print >>out, build.backend.h2('Additional objects')
+    for anon in anonymous_objects:
+        if anon.properties is not None:
+            print >>out, build.backend.h3(anon.name)
+            if anon.description:
+                print >>out, build.backend.para(build.backend.text(anon.description, ns.name))
+            print >>out, describe_object(build, ns, anon)
+
+@memoize
+def describe_type_as_text(build, t):
+    def simple_describe(t):
+        if t.type is not None:
+            if t.type == 'array':
+                return simple_describe(t.items) + ' array'
+            else:
+                return t.type
+        elif t.choices is not None:
+            return ' or '.join([ simple_describe(t2) for t2 in t.choices ])
+        elif t.ref is not None:
+            return t.ref
+        else:
+            raise ValueError('cannot describe {!r}: it has no type, choices or $ref'.format(t))
+
+    base = simple_describe(t)
+    if t.optional:
+        return 'optional {}'.format(base)
+    else:
+        return base
+
+@memoize
+def describe_type(build, ns, t, name = None):
+    if t.type is not None:
+        if t.type == 'array':
+            if t.items and t.items.type == 'object':
+                return build.backend.array_of(describe_type(build, ns, t.items, name))
+            else:
+                return build.backend.array_of(build.backend.code(describe_type(build, ns, t.items)))
+        elif name and t.type == 'object' and t.properties is not None:
+            return build.backend.anchor(name, t.type)
+        else:
+            return build.backend.code(t.type)
+    elif t.choices is not None:
+        return ' or '.join([ build.backend.code(describe_type(build, ns, t2, name)) for t2 in t.choices ])
+    elif t.ref is not None:
+        return build.backend.ref(t.ref_name)
+    else:
+        raise ValueError('cannot describe {!r}: it has no type, choices or $ref'.format(t))
+
+# What a parameter that refers to a type says about that type. With
+# --embed-types the type is described in place, so the wiki does not have to
+# fetch the other page when it renders this one.
+def describe_embedded_type(build, ns, param):
+    target = param.target
+    if build.embed_types and target is not None:
+        if target.type == 'object' and target.properties:
+            return describe_object(build, ns, target)
+        if target.type == 'string' and target.enum is not None:
+            return describe_enum(build, ns, target.enum)
+    return build.backend.embed_type(param.ref, param.ref_name)
+
+def function_example(param):
+    if param.parameters is not None:
+        fparams = ', '.join([ p.name for p in param.parameters ])
+    else:
+        fparams = ''
+    return 'function({}) {{...}}'.format(fparams)
+
+def describe_param(build, ns, param):
+    param_type = describe_type_as_text(build, param)
+    if param.type == 'function':
+        return (function_example(param), param_type)
+    else:
+        return (param.name, param_type)
+
+@memoize
+def describe_object(build, ns, obj, anchor=False):
+    props = obj.properties
+    if not props:
+        return ''
+
+    desc = [build.backend.values_start()]
+    for prop in props:
+        thing_type = describe_type(build, ns, prop, prop.name)
+        description = build.backend.text(prop.description, ns.name) or ''
+
+        desc.append(describe_thing_as_dl_item(build, prop.name, thing_type, prop.optional, description))
+
+    desc.append(build.backend.values_end())
+
+    return ''.join(desc)
+
+def describe_enum(build, ns, enum):
+    if len([ True for x in enum if type(x) != unicode ]):
+        desc = [build.backend.enum_table_start()]
+
+        for e in enum:
+            desc.append(build.backend.enum_row(e.name, build.backend.text(e.description, ns.name)))
+
+        desc.append(build.backend.enum_table_end())
+        return ''.join(desc)
+    else:
+        return build.backend.enum_values(', '.join([ build.backend.enum_value(s) for s in enum ]))
+
+def describe_function(build, ns, func):
+    if not func.parameters:
+        return ''
+
+    desc = ['The function is passed the following arguments:']
+
+    desc.append(build.backend.values_start())
+    for param in func.parameters:
+        thing_type = describe_type(build, ns, param, param.name)
+        description = build.backend.text(param.description, ns.name) or ''
+
+        desc.append(describe_thing_as_dl_item(build, param.name, thing_type, param.optional, description))
+
+    desc.append(build.backend.values_end())
+
+    return ''.join(desc)
+
+def make_namespace_dir(build, namespace):
+    path = os.path.join(build.out_dir, namespace)
+    if path in build.made_dirs:
+        return path
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    build.made_dirs.add(path)
+    return path
+
+# Pages are written to a temporary file that is renamed into place, so a
+# crash never leaves a half-written page behind for upload.py to publish.
+# Temporary files start with '.', which upload.py ignores.
+def write_page(build, slug, text):
+    (namespace, name) = slug.split('/')
+    with instrument.span('write', slug):
+        ns_dir = make_namespace_dir(build, namespace)
+        (fd, tmp_path) = tempfile.mkstemp(dir=ns_dir, prefix='.' + name + '.')
+        try:
+            out = os.fdopen(fd, 'w')
+            out.write(text)
+            out.close()
+            os.chmod(tmp_path, 0666 & ~_umask)
+            os.rename(tmp_path, os.path.join(ns_dir, name + build.backend.suffix))
+        except:
+            os.remove(tmp_path)
+            raise
+    instrument.count('pages written')
+    instrument.count('bytes written', len(text))
+
+# Collects the text of one page in memory; close() hands it to the build's
+# page_sink.
+class Page(object):
+    def __init__(self, build, slug):
+        self.build = build
+        self.slug = slug
+        self.chunks = []
+        self.head_end = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    # Marks the end of the JSON head that precedes the page body.
+    def end_head(self):
+        self.head_end = len(self.chunks)
+
+    def getvalue(self):
+        return ''.join(self.chunks)
+
+    # The page as (slug, head, body), with the head parsed.
+    def record(self):
+        head = json.loads(''.join(self.chunks[:self.head_end]), object_pairs_hook=json_hook)
+        return (self.slug, head, ''.join(self.chunks[self.head_end:]))
+
+    def close(self):
+        self.build.page_sink(self)
+
+# A bundle holds every page of a run in one file, as one JSON record per
+# line: {"slug": ..., "head": {...}, "body": ...}.
+class Bundle(object):
+    def __init__(self, path):
+        self.path = path
+        self.out = open(path + '.tmp', 'w')
+
+    def add(self, slug, head, body):
+        record = collections.OrderedDict([('slug', slug), ('head', head), ('body', body)])
+        line = json.dumps(record, separators=(',', ':'))
+        self.out.write(line)
+        self.out.write('\n')
+        instrument.count('pages written')
+        instrument.count('bytes written', len(line) + 1)
+
+    def close(self):
+        self.out.close()
+        os.rename(self.path + '.tmp', self.path)
+
+    def discard(self):
+        self.out.close()
+        os.remove(self.path + '.tmp')
+
+# The file a page is written to.
+def page_path(build, slug):
+    return os.path.join(build.out_dir, slug + build.backend.suffix)
+
+# The text of that file.
+def page_text(build, page):
+    head = ''.join(page.chunks[:page.head_end])
+    body = ''.join(page.chunks[page.head_end:])
+    return build.backend.document(page.slug, head, body)
+
+def write_page_file(build, page):
+    write_page(build, page.slug, page_text(build, page))
+
+def add_record(build, page):
+    build.record_sink.add(*page.record())
+
+def open_page(build, namespace, name):
+    return Page(build, namespace + '/' + name)
+
+def generate_preamble(build, namespace, name, kind):
+    out = open_page(build, namespace, name)
+
+    title = namespace + '.' + name
+    if kind == 'Method':
+        title += '()'
+
+    print >>out, '{'
+    print >>out, '"title": "{}",'.format(title)
+    print >>out, '"show_toc": 0,'
+    print >>out, get_api_component_tags(out, namespace, name, kind)
+    print >>out, "}"
+    out.end_head()
+
+    print >>out, build.backend.sidebar()
+
+    return out
+
+def generate_postamble(build, namespace, name, obj, kind, json_name, out):
+    print >>out, build.backend.compat(not obj.unsupported)
+    print >>out, build.backend.examples()
+    generate_acknowledgement(build, out, json_name, namespace, kind + name)
+
+def generate_acknowledgement(build, out, json_name, ns, anchor = None):
+    chromium_api = 'chrome.' + ns
+
+    chromium_docs = CHROMIUM_DOCS + ns
+    if anchor:
+        chromium_docs += '#' + anchor
+
+    source_file = os.path.basename(schema_path(build.in_dir, json_name))
+    chromium_json = build.json_sources[json_name] + source_file
+
+    print >>out, build.backend.acknowledgement(chromium_docs, chromium_api, chromium_json, source_file)
+    print >>out, build.backend.license(backends.LICENSE.strip())
+
+# A note on the permissions needed to use an API path, if the feature files
+# say it needs any.
+def generate_permissions(build, out, path):
+    if build.feature_set is None:
+        return
+    permissions = build.feature_set.permissions(path)
+    if not permissions:
+        return
+    names = ' and '.join([ build.backend.code(p) for p in permissions ])
+    if len(permissions) == 1:
+        print >>out, build.backend.permission(names)
+    else:
+        print >>out, build.backend.permissions(names)
+
+# The term of a definition list: the name of a parameter or property.
+def describe_name(build, name, optional):
+    if optional:
+        return build.backend.dt_optional(name)
+    else:
+        return build.backend.dt(name)
+
+def describe_thing_as_dl_item(build, name, thing_type, optional, description):
+    dl_item = describe_name(build, name, optional)
+
+    desc = '{}. '.format(thing_type)
+    desc += description
+
+    if desc:
+        dl_item += build.backend.dd(desc)
+
+    return dl_item
+
+def generate_function(build, json_name, ns, func):
+    out = generate_preamble(build, ns.name, func.name, "Method")
+
+    print >>out, build.backend.para(build.backend.text(func.description, ns.name) if func.description is not None else func.name)
+    generate_permissions(build, out, ns.name + '.' + func.name)
+
+    print >>out, build.backend.h2_id('Syntax', 'Syntax')
+
+    print >>out, build.backend.code_start()
+    print >>out, 'browser.{}.{}('.format(ns.name, func.name)
+
+    info = []
+    for (i, param) in enumerate(func.parameters):
+        (name, desc) = describe_param(build, ns, param)
+        if i != len(func.parameters) - 1:
+            name += ','
+        info.append((name, desc))
+
+    if info:
+        pad = max([ len(name) for (name, desc) in info ])
+    else:
+        pad = 0
+    for (name, desc) in info:
+        print >>out, '  {:<{}} // {}'.format(name, pad, desc)
+    print >>out, ')'
+    print >>out, build.backend.code_end()
+
+    print >>out, build.backend.h3_id('Parameters', 'Parameters')
+    print >>out, build.backend.dl_start()
+
+    for param in func.parameters:
+        print >>out, describe_name(build, param.name, param.optional)
+
+        desc = '{}. '.format(describe_type(build, ns, param))
+        desc += build.backend.text(param.description, ns.name) or ''
+
+        if param.type == 'object':
+            desc += describe_object(build, ns, param)
+        elif param.type == 'function':
+            desc += describe_function(build, ns, param)
+        elif param.choices:
+            for choice in param.choices:
+                if choice.type == 'object':
+                    desc += describe_object(build, ns, choice)
+                elif choice.type == 'function':
+                    desc += describe_function(build, ns, choice)
+        elif param.ref:
+            desc += describe_embedded_type(build, ns, param)
+
+        if desc:
+            print >>out, build.backend.dd(desc)
+
+    if len(func.parameters) == 0:
+        print >>out, "None."
+    print >>out, build.backend.dl_end()
+
+    if func.returns is not None:
+        print >>out, build.backend.h3('Return value')
+        print >>out, '{}{}. '.format(build.backend.para_start(), describe_type(build, ns, func.returns))
+        if func.returns.description is not None:
+            print >>out, '{}{}'.format(build.backend.text(func.returns.description, ns.name), build.backend.para_end())
+
+    describe_anonymous_objects(build, ns, func.anonymous_objects, out)
+
+    generate_postamble(build, ns.name, func.name, func, 'method-', json_name, out)
+
+    out.close()
+
+def generate_type(build, json_name, ns, t):
+    out = generate_preamble(build, ns.name, t.id, "Type")
+
+    print >>out, build.backend.para(build.backend.text(t.description, ns.name) if t.description is not None else t.id)
+
+    print >>out, build.backend.h2_id('Type', 'Type')
+
+    if t.type == 'object':
+        print >>out, 'Values of this type are objects.'
+        if t.properties:
+            print >>out, " They contain the following properties:"
+            print >>out, describe_object(build, ns, t, True)
+        else:
+            print >>out, '.' + build.backend.para_end()
+    elif t.type == 'string':
+        print >>out, 'Values of this type are strings.'
+        if t.enum is not None:
+            print >>out, describe_enum(build, ns, t.enum)
+        print >>out, build.backend.para_end()
+
+    elif t.type == 'array':
+        print >>out, 'Values of this type are {}s.'.format(describe_type(build, ns, t))
+        if t.min_items is not None:
+            assert t.min_items == t.max_items
+            print >>out, 'The array should contain {} elements.'.format(t.min_items)
+
+        items = t.items
+        if items.minimum is not None:
+            print >>out, 'Array elements should be between {} and {}.'.format(
+                items.minimum, items.maximum)
+
+        if items.type == 'object':
+            print >>out, build.backend.para('Elements of the array look like:')
+            print >>out, describe_object(build, ns, items)
+    else:
+        raise ValueError('{!r} is of type {}, which has no page'.format(t, t.type))
+
+    describe_anonymous_objects(build, ns, t.anonymous_objects, out)
+
+    generate_postamble(build, ns.name, t.id, t, 'type-', json_name, out)
+
+    out.close()
+
+def generate_property(build, json_name, ns, prop):
+    out = generate_preamble(build, ns.name, prop.name, "Property")
+
+    print >>out, build.backend.para(build.backend.text(prop.description, ns.name) if prop.description is not None else prop.name)
+    generate_permissions(build, out, ns.name + '.' + prop.name)
+
+    generate_postamble(build, ns.name, prop.name, prop, 'property-', json_name, out)
+
+    out.close()
+
+def generate_event(build, json_name, ns, func):
+    out = generate_preamble(build, ns.name, func.name, "Event")
+
+    print >>out, build.backend.para(build.backend.text(func.description, ns.name) if func.description is not None else func.name)
+    generate_permissions(build, out, ns.name + '.' + func.name)
+
+    print >>out, build.backend.h2_id('Syntax', 'Syntax')
+
+    params = func.parameters or []
+
+    print >>out, build.backend.code_start()
+    if len(params):
+        print >>out, 'browser.{}.{}.addListener(function('.format(ns.name, func.name)
+
+        info = []
+        for (i, param) in enumerate(params):
+            (name, desc) = describe_param(build, ns, param)
+            if i != len(func.parameters) - 1:
+                name += ','
+            info.append((name, desc))
+
+        if info:
+            pad = max([ len(name) for (name, desc) in info ])
+        else:
+            pad = 0
+        for (name, desc) in info:
+            print >>out, '  {:<{}} // {}'.format(name, pad, desc)
+        print >>out, ') {...})'
+    else:
+        print >>out, 'browser.{}.{}.addListener(function() {{...}})'.format(ns.name, func.name)
+
+    print >>out, 'browser.{}.{}.removeListener(listener)'.format(ns.name, func.name)
+    print >>out, 'browser.{}.{}.hasListener(listener)'.format(ns.name, func.name)
+    print >>out, build.backend.code_end()
+
+    extra_params = func.extra_parameters
+    add_listener_params = ", ".join(["callback"] + [extra_param.name for extra_param in extra_params])
+
+    listener = build.backend.code('listener')
+    print >>out, build.backend.para('Events have three functions:')
+    print >>out, build.backend.dl_start()
+    print >>out, build.backend.dt('addListener({})'.format(add_listener_params))
+    print >>out, build.backend.dd('Adds a listener to this event.')
+
+    print >>out, build.backend.dt('removeListener(listener)')
+    print >>out, build.backend.dd('Stop listening to this event. \n'
+                            'The {} argument is the listener to remove.'.format(listener))
+
+    print >>out, build.backend.dt('hasListener(listener)')
+    print >>out, build.backend.dd('Check whether {} is registered for this event. \n'
+                            'Returns {} if it is listening, {} otherwise.'.format(
+                                listener, build.backend.code('true'), build.backend.code('false')))
+
+    print >>out, build.backend.dl_end()
+
+    print >>out, build.backend.h2('addListener syntax')
+    print >>out, build.backend.h3('Parameters')
+
+    print >>out, build.backend.dl_start() + build.backend.dt('callback')
+
+    callback_desc = [build.backend.para_start() + "Function that will be called when this event occurs."]
+
+    if len(params) > 0:
+        callback_desc.append(" The function will be passed the following arguments:" + build.backend.para_end())
+
+        for param in params:
+            arg = '{}. {}'.format(describe_type(build, ns, param, param.name), build.backend.text(param.description, ns.name) or '')
+
+            if param.type == 'function':
+                arg += describe_function(build, ns, param)
+            callback_desc.append(build.backend.args_start() + build.backend.dt(param.name) + build.backend.dd(arg) +
+                                 build.backend.args_end())
+
+    if func.returns is not None:
+        return_type_desc = describe_type(build, ns, func.returns)
+
+        callback_desc.append('{}Returns: {}. '.format(build.backend.para_start(), return_type_desc))
+        if func.returns.description is not None:
+            callback_desc.append(' {}'.format(build.backend.text(func.returns.description, ns.name)))
+        callback_desc.append(build.backend.para_end())
+
+    print >>out, build.backend.dd(''.join(callback_desc))
+
+    if len(extra_params):
+        for param in extra_params:
+            print >>out, describe_name(build, param.name, param.optional)
+
+            desc = '{}. '.format(describe_type(build, ns, param))
+            desc += build.backend.text(param.description, ns.name) or ''
+
+            if param.type == 'object':
+                desc += describe_object(build, ns, param)
+
+            elif param.type == 'function':
+                desc += describe_function(build, ns, param)
+            if desc:
+                print >>out, build.backend.dd(desc)
+
+    print >>out, build.backend.dl_end()
+
+    describe_anonymous_objects(build, ns, func.anonymous_objects, out)
+
+    generate_postamble(build, ns.name, func.name, func, 'event-', json_name, out)
+
+    out.close()
+
+# We want to preserve the order from the original JSON file.
+def json_hook(pairs):
+    return collections.OrderedDict(pairs)
+
+# Schemas are read from <name>.json, or from <name>.idl if there is no JSON
+# version.
+def schema_path(in_dir, name):
+    path = os.path.join(in_dir, name + '.json')
+    if not os.path.exists(path):
+        idl_path = os.path.join(in_dir, name + '.idl')
+        if os.path.exists(idl_path):
+            return idl_path
+    return path
+
+def load_namespaces(build, name):
+    if name in build.models:
+        return build.models[name]
+
+    in_path = schema_path(build.in_dir, name)
+
+    if build.schema_cache is not None:
+        with instrument.span('schema cache', name, schema=name):
+            namespaces = build.schema_cache.get(name, in_path)
+        if namespaces is not None:
+            build.models[name] = namespaces
+            return namespaces
+        st = os.stat(in_path)
+
+    with instrument.span('read', name, schema=name):
+        source = open(in_path).read()
+    instrument.count('bytes read', len(source))
+
+    with schemacache.gc_paused():
+        if in_path.endswith('.idl'):
+            with instrument.span('preprocess', name, schema=name):
+                text = preprocess.convert_references(source)
+            with instrument.span('parse', name, schema=name):
+                data = idl_schema.parse(text.decode('utf-8'), in_path)
+        else:
+            with instrument.span('preprocess', name, schema=name):
+                text = preprocess.preprocess_json(source)
+            with instrument.span('parse', name, schema=name):
+                data = json.loads(text, object_pairs_hook=json_hook)
+        # Cached models carry digests, so they serve runs with a render
+        # cache too.
+        digests = build.render_cache is not None or build.schema_cache is not None
+        with instrument.span('model', name, schema=name):
+            build.models[name] = apimodel.build_namespaces(data, name, digests)
+
+    if build.schema_cache is not None:
+        with instrument.span('schema cache', name, schema=name):
+            build.schema_cache.put(name, build.schema_cache.stamp(st, source), build.models[name])
+    return build.models[name]
+
+# What the schema cache's entries depend on: the code that reads and parses
+# schema files and builds their models.
+def schema_cache_version():
+    h = hashlib.sha1(sys.version)
+    for module in (preprocess, idl_schema, apimodel):
+        h.update(inspect.getsource(module))
+    h.update(inspect.getsource(load_namespaces))
+    h.update(inspect.getsource(json_hook))
+    return h.hexdigest()
+
+# Drops a parsed schema so that the next load_namespaces reads it again, and
+# with it every cached description, which may describe its nodes.
+def forget_schema(build, name):
+    build.models.pop(name, None)
+    build.descriptions.clear()
+
+# Every schema file in in_dir.
+def schema_names(in_dir):
+    names = set()
+    for filename in os.listdir(in_dir):
+        (name, ext) = os.path.splitext(filename)
+        if ext in ('.json', '.idl') and not name.startswith('_'):
+            names.add(name)
+    return sorted(names)
+
+# Builds the index of every symbol in in_dir and resolves references across
+# schema files. Files that cannot be parsed are left out, and are returned
+# with their errors.
+def build_symbol_index(build):
+    index = symbols.SymbolIndex()
+    failed = []
+    for name in schema_names(build.in_dir):
+        try:
+            index.add(load_namespaces(build, name))
+        except Exception:
+            failed.append((name, name, traceback.format_exc()))
+    for namespaces in build.models.values():
+        index.resolve(namespaces)
+    return (index, failed)
+
+# Schema files that define a namespace the feature files make available.
+# They all come from extensions/common/api, where the feature files live.
+def select_schemas(build):
+    selected = []
+    for name in schema_names(build.in_dir):
+        try:
+            namespaces = load_namespaces(build, name)
+        except Exception:
+            continue
+        if any(build.feature_set.is_available(ns.name) for ns in namespaces):
+            build.json_sources.setdefault(name, LINK2)
+            selected.append(name)
+    return selected
+
+def broken_refs(build, names):
+    broken = []
+    for name in names:
+        if name in build.models:
+            broken.extend(build.symbol_index.broken_refs(build.models[name]))
+    return broken
+
+def generate_index(build, name, ns):
+    out = open_page(build, ns.name, 'INDEX')
+
+    title = ns.name
+    print >>out, '{'
+    print >>out, '"title": "{}",'.format(title)
+    print >>out, '"show_toc": 0,'
+    print >>out, get_api_tags(out, title)
+    print >>out, "}"
+    out.end_head()
+
+    print >>out, build.backend.index_sidebar()
+    print >>out, build.backend.para(build.backend.text(ns.description, ns.name) if ns.description is not None else ns.name)
+    generate_permissions(build, out, ns.name)
+
+    if ns.types is not None:
+        print >>out, build.backend.h2_id('Types', 'Types')
+        print >>out, build.backend.dl_start()
+        for t in ns.types:
+            print >>out, build.backend.index_entry('{}.{}'.format(title, t.id))
+            if t.description is not None:
+                print >>out, build.backend.dd(build.backend.text(t.description, ns.name))
+        print >>out, build.backend.dl_end()
+
+    if ns.properties is not None:
+        print >>out, build.backend.h2_id('Properties', 'Properties')
+        print >>out, build.backend.dl_start()
+        for prop in ns.properties:
+            print >>out, build.backend.index_entry('{}.{}'.format(title, prop.name))
+            if prop.description is not None:
+                print >>out, build.backend.dd(build.backend.text(prop.description, ns.name))
+        print >>out, build.backend.dl_end()
+
+    if ns.functions is not None:
+        print >>out, build.backend.h2_id('Functions', 'Functions')
+        print >>out, build.backend.dl_start()
+        for func in ns.functions:
+            print >>out, build.backend.index_entry('{}.{}()'.format(title, func.name))
+            if func.description is not None:
+                print >>out, build.backend.dd(build.backend.text(func.description, ns.name))
+        print >>out, build.backend.dl_end()
+
+    if ns.events is not None:
+        print >>out, build.backend.h2_id('Events', 'Events')
+        print >>out, build.backend.dl_start()
+        for func in ns.events:
+            print >>out, build.backend.index_entry('{}.{}'.format(title, func.name))
+            if func.description is not None:
+                print >>out, build.backend.dd(build.backend.text(func.description, ns.name))
+        print >>out, build.backend.dl_end()
+
+    print >>out, build.backend.compat(True)
+    print >>out, build.backend.chrome_compat()
+    print >>out, build.backend.examples()
+
+    generate_acknowledgement(build, out, name, ns.name)
+
+    out.close()
+
+# Every page of a schema file, as (slug, task) pairs in the order a serial
+# run writes them.
+def page_tasks(build, name):
+    tasks = []
+    for (i, ns) in enumerate(load_namespaces(build, name)):
+        if build.index_first:
+            tasks.append((ns.name + '/INDEX', ('index', name, i, None)))
+
+        for (j, func) in enumerate(ns.functions or []):
+            tasks.append((ns.name + '/' + func.name, ('function', name, i, j)))
+
+        for (j, prop) in enumerate(ns.properties or []):
+            tasks.append((ns.name + '/' + prop.name, ('property', name, i, j)))
+
+        for (j, typ) in enumerate(ns.types or []):
+            tasks.append((ns.name + '/' + typ.id, ('type', name, i, j)))
+
+        for (j, event) in enumerate(ns.events or []):
+            tasks.append((ns.name + '/' + event.name, ('event', name, i, j)))
+
+        if not build.index_first:
+            tasks.append((ns.name + '/INDEX', ('index', name, i, None)))
+    return tasks
+
+def run_task(build, task):
+    (kind, name, i, j) = task
+    ns = load_namespaces(build, name)[i]
+    if kind == 'function':
+        generate_function(build, name, ns, ns.functions[j])
+    elif kind == 'property':
+        generate_property(build, name, ns, ns.properties[j])
+    elif kind == 'type':
+        generate_type(build, name, ns, ns.types[j])
+    elif kind == 'event':
+        generate_event(build, name, ns, ns.events[j])
+    else:
+        generate_index(build, name, ns)
+
+# What render_salt is made from: the page templates, and the code that
+# decides what goes on a page.
+def render_cache_salt(build):
+    h = hashlib.sha1(templates_hash(build))
+    h.update(inspect.getsource(symbols))
+    h.update(inspect.getsource(features))
+    return h.hexdigest()
+
+_MEMBERS = {'function': 'functions', 'property': 'properties', 'type': 'types', 'event': 'events'}
+
+# The render cache key of a page: the digest of the JSON the page is built
+# from, and with --embed-types, of the types it describes in place.
+def page_key(build, slug, task):
+    (kind, name, i, j) = task
+    ns = load_namespaces(build, name)[i]
+    if kind == 'index':
+        node = ns
+    else:
+        node = getattr(ns, _MEMBERS[kind])[j]
+    h = hashlib.sha1(build.render_salt)
+    h.update(json.dumps([slug, kind, ns.name, os.path.basename(schema_path(build.in_dir, name)),
+                         build.json_sources.get(name)]))
+    h.update(node.digest)
+    if build.embed_types and kind != 'index':
+        for n in symbols.walk(node):
+            if n.target is not None:
+                h.update(n.target.digest or n.ref_name)
+    return h.hexdigest()
+
+# A render cache entry holds the length of the page's head, and the page.
+def cached_page(build, slug, value):
+    (head_length, sep, text) = value.partition('\n')
+    page = Page(build, slug)
+    page.chunks = [text[:int(head_length)], text[int(head_length):]]
+    page.head_end = 1
+    return page
+
+def cache_entry(page):
+    head = ''.join(page.chunks[:page.head_end])
+    text = page.getvalue()
+    if isinstance(text, unicode):
+        head = head.encode('utf-8')
+        text = text.encode('utf-8')
+    return '{}\n{}'.format(len(head), text)
+
+def render(build, slug, task):
+    if build.render_cache is None:
+        with instrument.span('render ' + task[0], slug, schema=task[1]):
+            run_task(build, task)
+        return
+
+    key = page_key(build, slug, task)
+    value = build.render_cache.get(key)
+    if value is not None:
+        instrument.count('render cache hits')
+        cached_page(build, slug, value).close()
+        return
+
+    instrument.count('render cache misses')
+    sink = build.page_sink
+    pages = []
+    build.page_sink = pages.append
+    try:
+        with instrument.span('render ' + task[0], slug, schema=task[1]):
+            run_task(build, task)
+    finally:
+        build.page_sink = sink
+    for page in pages:
+        build.render_cache.put(key, cache_entry(page))
+        page.close()
+
+# The pages of a schema file that have not been quarantined.
+def schema_tasks(build, name):
+    return [ (slug, task) for (slug, task) in page_tasks(build, name) if slug not in build.quarantined ]
+
+def generate_schema(build, name):
+    for (slug, task) in schema_tasks(build, name):
+        render(build, slug, task)
+
+# Renders the pages of the schema files `names` one at a time, and returns
+# the errors instead of stopping at the first.
+def generate_keep_going(build, names):
+    errors = []
+    for name in names:
+        try:
+            tasks = schema_tasks(build, name)
+        except Exception:
+            errors.append((name, os.path.basename(schema_path(build.in_dir, name)), traceback.format_exc()))
+            continue
+        for (slug, task) in tasks:
+            try:
+                render(build, slug, task)
+            except Exception:
+                errors.append((name, slug, traceback.format_exc()))
+    return errors
+
+# Loads the schema files `names` and checks them with validate.py. Returns
+# the problems found, and (schema, file, traceback) for each file that could
+# not be loaded.
+def validate_schemas(build, names):
+    problems = []
+    errors = []
+    for name in names:
+        try:
+            namespaces = load_namespaces(build, name)
+        except Exception:
+            errors.append((name, os.path.basename(schema_path(build.in_dir, name)), traceback.format_exc()))
+            continue
+        with instrument.span('validate', name, schema=name):
+            problems.extend(validate.check(namespaces, name))
+    return (problems, errors)
+
+# Quarantines the pages that the problems in the schema files `names` would
+# break, and every page of a schema file that has no source link, so that
+# the rest can be rendered. Files that cannot be loaded are left out of the
+# names returned, and their errors added to the result.
+def quarantine_schemas(build, names, result):
+    (problems, errors) = validate_schemas(build, names)
+    failed = set(name for (name, what, tb) in errors)
+    names = [ name for name in names if name not in failed ]
+    for name in names:
+        if name not in build.json_sources:
+            pages = sorted(set(slug for (slug, task) in page_tasks(build, name)))
+            problems.append(validate.Problem(name, None, name, 'has no source link in JSON_SOURCES', pages))
+    for problem in problems:
+        build.quarantined.update(problem.pages)
+    result.problems = problems
+    result.errors.extend(errors)
+    return names
+
+# The build a worker process renders pages for, set when the pool starts it.
+_worker_build = None
+
+def start_worker(build):
+    global _worker_build
+    _worker_build = build
+
+# Runs a unit of work in a worker process. When building a bundle, the pages
+# are returned to the parent, which writes them in order. So are timings,
+# when they are being recorded, and render cache hits and misses.
+def run_unit(unit):
+    build = _worker_build
+    errors = []
+    records = []
+    if build.record_sink is not None:
+        build.page_sink = lambda page: records.append(page.record())
+
+    cached = None
+    if build.render_cache is not None:
+        (build.render_cache.hits, build.render_cache.misses) = (0, 0)
+    for (slug, task) in unit:
+        try:
+            render(build, slug, task)
+        except Exception:
+            errors.append((task[1], slug, traceback.format_exc()))
+    if build.render_cache is not None:
+        cached = (build.render_cache.hits, build.render_cache.misses)
+    recorded = instrument.drain() if instrument.enabled else None
+    return (errors, records, recorded, cached)
+
+def generate_parallel(build, names, jobs):
+    errors = []
+    units = []
+    for name in names:
+        try:
+            tasks = schema_tasks(build, name)
+        except Exception:
+            errors.append((name, os.path.basename(schema_path(build.in_dir, name)), traceback.format_exc()))
+            continue
+
+        if len(tasks) <= SHARD_PAGES:
+            units.append(tasks)
+            continue
+
+        # Pages that share a slug overwrite each other, so they stay in one
+        # unit and keep their serial order.
+        by_slug = collections.OrderedDict()
+        for (slug, task) in tasks:
+            by_slug.setdefault(slug, []).append((slug, task))
+        units.extend(by_slug.values())
+
+    # The schemas are parsed before the pool forks, so workers share them
+    # along with the build that holds them. Workers start with no timings,
+    # so that they only send back their own.
+    recorded = instrument.drain()
+    pool = multiprocessing.Pool(jobs, start_worker, (build,))
+    instrument.merge(recorded)
+    try:
+        for (unit_errors, records, recorded, cached) in pool.imap(run_unit, units):
+            errors.extend(unit_errors)
+            for record in records:
+                build.record_sink.add(*record)
+            if recorded is not None:
+                instrument.merge(recorded)
+            if cached is not None:
+                build.render_cache.hits += cached[0]
+                build.render_cache.misses += cached[1]
+    finally:
+        pool.close()
+        pool.join()
+
+    return errors
+
+def file_hash(path):
+    return hashlib.sha1(open(path, 'rb').read()).hexdigest()
+
+# Anything that changes every page: the page templates and the code that
+# renders them.
+def templates_hash(build):
+    h = hashlib.sha1()
+    h.update(inspect.getsource(backends))
+    h.update(build.backend.name)
+    h.update(CHROMIUM_DOCS)
+    h.update(json.dumps(build.json_sources, sort_keys=True))
+    h.update(inspect.getsource(sys.modules[__name__]))
+    h.update(inspect.getsource(apimodel))
+    h.update('embed_types' if build.embed_types else '')
+    # Where links between pages go depends on every schema file in in_dir.
+    if build.backend.resolves_refs and build.symbol_index is not None:
+        h.update(build.symbol_index.signature())
+    if build.feature_set is not None:
+        h.update(build.feature_set.signature)
+    return h.hexdigest()
+
+# The manifest maps each schema file to the hash it was last built from and
+# the pages it produced. It is discarded when the templates change.
+def load_manifest(build, templates):
+    path = os.path.join(build.out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    manifest = json.load(open(path))
+    if manifest.get('templates') != templates:
+        return {}
+    return manifest['schemas']
+
+def save_manifest(build, templates, schemas):
+    path = os.path.join(build.out_dir, MANIFEST)
+    out = open(path + '.tmp', 'w')
+    json.dump({'templates': templates, 'schemas': schemas}, out,
+              indent=1, sort_keys=True, separators=(',', ': '))
+    out.close()
+    os.rename(path + '.tmp', path)
+
+def is_up_to_date(build, entry, digest):
+    if entry is None or entry['hash'] != digest:
+        return False
+    return all(os.path.exists(page_path(build, slug)) for slug in entry['pages'])
+
+def remove_stale_pages(build, schemas, old_pages):
+    produced = set()
+    for entry in schemas.values():
+        produced.update(entry['pages'])
+
+    for slug in sorted(set(old_pages) - produced):
+        path = page_path(build, slug)
+        if os.path.exists(path):
+            os.remove(path)
+        ns_dir = os.path.dirname(path)
+        if os.path.isdir(ns_dir) and not os.listdir(ns_dir):
+            os.rmdir(ns_dir)
+
+# The hash a schema file's pages are built from. Embedded types make pages
+# depend on the schema files that define them as well.
+def schema_digest(build, name):
+    digest = file_hash(schema_path(build.in_dir, name))
+    if not build.embed_types:
+        return digest
+    h = hashlib.sha1(digest)
+    for dep in sorted(build.symbol_index.dependencies(load_namespaces(build, name))):
+        h.update(file_hash(schema_path(build.in_dir, dep)))
+    return h.hexdigest()
+
+# Returns the errors, and the number of schema files that were up to date.
+def generate_incremental(build, names, jobs, keep_going=False):
+    templates = templates_hash(build)
+    schemas = load_manifest(build, templates)
+
+    stale = []
+    digests = {}
+    for name in names:
+        digests[name] = schema_digest(build, name)
+        if not is_up_to_date(build, schemas.get(name), digests[name]):
+            stale.append(name)
+
+    # Failed schema files, and those with quarantined pages, are left out of
+    # the manifest so they are retried, and their old pages are kept.
+    previous = dict((name, schemas.pop(name)) for name in stale if name in schemas)
+    errors = []
+    built = []
+    try:
+        if jobs or keep_going:
+            if jobs:
+                errors = generate_parallel(build, stale, jobs)
+            else:
+                errors = generate_keep_going(build, stale)
+            failed = set(name for (name, what, tb) in errors)
+            built = [ name for name in stale if name not in failed and
+                      not any(slug in build.quarantined for (slug, task) in page_tasks(build, name)) ]
+        else:
+            for name in stale:
+                generate_schema(build, name)
+                built.append(name)
+    finally:
+        old_pages = []
+        for name in built:
+            schemas[name] = {
+                'hash': digests[name],
+                'pages': sorted(set(slug for (slug, task) in page_tasks(build, name))),
+            }
+            if name in previous:
+                old_pages.extend(previous[name]['pages'])
+        remove_stale_pages(build, schemas, old_pages)
+        save_manifest(build, templates, schemas)
+
+    return (errors, len(names) - len(stale))
+
+# Keeps the schemas in memory and regenerates pages whenever a schema file
+# changes, rewriting only the pages whose text changed.
+class Watch(object):
+    def __init__(self, build, names, check_refs):
+        self.build = build
+        self.names = names
+        self.check_refs = check_refs
+        # Digests of the pages on disk, and the pages of each schema file.
+        self.digests = {}
+        self.pages = {}
+
+    # Renders every page of a schema file in memory, and writes the ones
+    # that changed. Returns the number of pages written.
+    def render(self, name):
+        build = self.build
+        texts = collections.OrderedDict()
+        sink = build.page_sink
+        build.page_sink = lambda page: texts.__setitem__(page.slug, page_text(build, page))
+        try:
+            generate_schema(build, name)
+        finally:
+            build.page_sink = sink
+
+        written = 0
+        for (slug, text) in texts.items():
+            digest = hashlib.sha1(text).hexdigest()
+            if self.digests.get(slug) != digest:
+                write_page(build, slug, text)
+                self.digests[slug] = digest
+                written += 1
+
+        for slug in self.pages.get(name, set()) - set(texts):
+            path = page_path(build, slug)
+            if os.path.exists(path):
+                os.remove(path)
+            self.digests.pop(slug, None)
+            written += 1
+        self.pages[name] = set(texts)
+        return written
+
+    # The schema files to regenerate when `changed` have been reloaded:
+    # those among them that are being generated, and with --embed-types,
+    # those that embed their types.
+    def affected(self, changed):
+        build = self.build
+        affected = [ name for name in self.names if name in changed ]
+        if build.embed_types:
+            for name in self.names:
+                if name not in affected and name in build.models and \
+                        build.symbol_index.dependencies(build.models[name]) & changed:
+                    affected.append(name)
+        return affected
+
+    def rebuild(self, names):
+        build = self.build
+        if build.symbol_index is not None:
+            signature = build.symbol_index.signature()
+            (build.symbol_index, unparsed) = build_symbol_index(build)
+            # Any page may link to a symbol that came, went or moved.
+            if build.backend.resolves_refs and build.symbol_index.signature() != signature:
+                names = self.names
+
+        for name in names:
+            start = time.time()
+            try:
+                written = self.render(name)
+            except Exception:
+                print >>sys.stderr, 'Failed to generate {}:'.format(name)
+                print >>sys.stderr, traceback.format_exc()
+                continue
+            print '{}: {} pages written in {:.3f}s'.format(
+                os.path.basename(schema_path(build.in_dir, name)), written, time.time() - start)
+
+        if self.check_refs:
+            print_broken_refs(broken_refs(build, names), build.in_dir)
+
+    def run(self):
+        build = self.build
+        self.rebuild(self.names)
+
+        # With a symbol index, any schema file can change what is generated.
+        if build.symbol_index is not None:
+            watched = schema_names(build.in_dir)
+        else:
+            watched = self.names
+        paths = dict((schema_path(build.in_dir, name), name) for name in watched)
+        files = watcher.make_watcher(paths.keys())
+        print 'Watching {} schema files for changes ({})'.format(
+            len(paths), files.__class__.__name__)
+        try:
+            while True:
+                changed = set(paths[path] for path in files.wait())
+                # Pages of schema files that no longer parse are left as
+                # they were.
+                for name in sorted(changed):
+                    forget_schema(build, name)
+                    try:
+                        load_namespaces(build, name)
+                    except Exception:
+                        print >>sys.stderr, 'Failed to read {}:'.format(schema_path(build.in_dir, name))
+                        print >>sys.stderr, traceback.format_exc()
+                        changed.remove(name)
+                self.rebuild(self.affected(changed))
+        finally:
+            files.close()
+
+# Options for a run of generate(). `select` is a features.Query, or None to
+# generate only the schema files named. `render_cache` is a
+# rendercache.RenderCache, or None, and `schema_cache` a directory for
+# parsed schemas, or None. With `index_first`, each namespace's INDEX page
+# comes before its other pages. With `keep_going`, schemas are checked before
+# rendering, pages they would fail to render are quarantined, and errors are
+# collected in the result instead of raised. `format` names the backend in
+# backends.BACKENDS that writes the pages.
+class GenerateConfig(object):
+    __slots__ = ('jobs', 'incremental', 'embed_types', 'check_refs', 'select',
+                 'description_cache', 'render_cache', 'schema_cache',
+                 'index_first', 'keep_going', 'format')
+
+    def __init__(self, jobs=None, incremental=False, embed_types=False,
+                 check_refs=False, select=None, description_cache=0,
+                 render_cache=None, schema_cache=None, index_first=False,
+                 keep_going=False, format='mdn'):
+        self.jobs = jobs
+        self.incremental = incremental
+        self.embed_types = embed_types
+        self.check_refs = check_refs
+        self.select = select
+        self.description_cache = description_cache
+        self.render_cache = render_cache
+        self.schema_cache = schema_cache
+        self.index_first = index_first
+        self.keep_going = keep_going
+        self.format = format
+
+class GenerateResult(object):
+    __slots__ = ('names', 'in_dir', 'errors', 'broken_refs', 'unindexed', 'problems',
+                 'skipped', 'caches')
+
+    def __init__(self, names, in_dir):
+        self.names = names
+        self.in_dir = in_dir
+        # (schema, page or file, traceback) for everything that failed.
+        self.errors = []
+        self.broken_refs = []
+        # Schema files left out of the symbol index because they do not parse.
+        self.unindexed = []
+        # validate.Problems whose pages were quarantined.
+        self.problems = []
+        # Schema files that --incremental found up to date.
+        self.skipped = 0
+        # Hits and misses of the description, render and schema caches that
+        # were used, keyed by 'description', 'render' and 'schema'.
+        self.caches = {}
+
+# Makes the Build for a run that reads schemas from in_dir and writes pages
+# to out_sink, as the config says, and the result that the run fills in,
+# with the schema files to generate.
+def configure(names, in_dir, out_sink, config):
+    build = Build(in_dir, config.format)
+    build.index_first = config.index_first
+
+    if config.schema_cache is not None:
+        build.schema_cache = schemacache.SchemaCache(config.schema_cache, schema_cache_version())
+
+    # Pages are only looked up in the render cache by the digests of their
+    # schemas' JSON, which load_namespaces computes when there is one.
+    build.render_cache = config.render_cache
+
+    if isinstance(out_sink, basestring):
+        build.out_dir = out_sink
+    else:
+        build.page_sink = lambda page: add_record(build, page)
+        build.record_sink = out_sink
+
+    build.embed_types = config.embed_types
+    build.descriptions.size = config.description_cache
+
+    names = list(names)
+    if config.select is not None:
+        build.feature_set = features.Features(in_dir, config.select)
+        names += [ name for name in select_schemas(build) if name not in names ]
+
+    result = GenerateResult(names, in_dir)
+    if config.check_refs or config.embed_types or build.backend.resolves_refs:
+        (build.symbol_index, result.unindexed) = build_symbol_index(build)
+
+    if build.render_cache is not None:
+        build.render_salt = render_cache_salt(build)
+
+    return (build, result)
+
+# Generates the pages of the schema files `names` in in_dir. out_sink is an
+# output directory, or an object whose add(slug, head, body) takes each page,
+# such as a Bundle. Without keep_going, jobs or incremental, the first
+# error is raised; otherwise errors are collected in the result.
+def generate(names, in_dir, out_sink, config=None):
+    config = config or GenerateConfig()
+    if config.incremental and not isinstance(out_sink, basestring):
+        raise ValueError('incremental builds need an output directory')
+
+    (build, result) = configure(names, in_dir, out_sink, config)
+    names = result.names
+    if config.keep_going:
+        names = quarantine_schemas(build, names, result)
+
+    if config.incremental:
+        (errors, result.skipped) = generate_incremental(build, names, config.jobs, config.keep_going)
+        result.errors += errors
+    elif config.jobs:
+        result.errors += generate_parallel(build, names, config.jobs)
+    elif config.keep_going:
+        result.errors += generate_keep_going(build, names)
+    else:
+        for name in result.names:
+            generate_schema(build, name)
+
+    if build.render_cache is not None:
+        build.render_cache.trim()
+    if config.check_refs:
+        result.broken_refs = broken_refs(build, result.names)
+
+    # Workers keep their own description caches, which are not added up.
+    if build.descriptions.size and not config.jobs:
+        result.caches['description'] = build.descriptions.stats()
+    if build.render_cache is not None:
+        result.caches['render'] = build.render_cache.stats()
+    if build.schema_cache is not None:
+        result.caches['schema'] = build.schema_cache.stats()
+    return result
+
+def print_cache_stats(result):
+    stats = result.caches.get('description')
+    if stats is not None:
+        print >>sys.stderr, 'Description cache: {hits} hits, {misses} misses'.format(**stats)
+        instrument.count('description cache hits', stats['hits'])
+        instrument.count('description cache misses', stats['misses'])
+    stats = result.caches.get('render')
+    if stats is not None:
+        print >>sys.stderr, 'Render cache: {hits} hits, {misses} misses'.format(**stats)
+    stats = result.caches.get('schema')
+    if stats is not None:
+        print >>sys.stderr, 'Schema cache: {hits} hits, {misses} misses'.format(**stats)
+        instrument.count('schema cache hits', stats['hits'])
+        instrument.count('schema cache misses', stats['misses'])
+
+# Prints what went wrong in a run, and returns whether anything did.
+def print_result(result):
+    for name in result.unindexed:
+        print >>sys.stderr, 'Could not index {}'.format(schema_path(result.in_dir, name[0]))
+
+    for (name, what, tb) in result.errors:
+        print >>sys.stderr, 'Failed to generate {}:'.format(what)
+        print >>sys.stderr, tb
+    validate.print_problems(result.problems)
+    print_broken_refs(result.broken_refs, result.in_dir)
+
+    if result.problems:
+        pages = set()
+        for problem in result.problems:
+            pages.update(problem.pages)
+        print >>sys.stderr, '{} problems, {} pages quarantined'.format(len(result.problems), len(pages))
+    if result.errors:
+        print >>sys.stderr, '{} errors'.format(len(result.errors))
+    if result.broken_refs:
+        print >>sys.stderr, '{} broken references'.format(len(result.broken_refs))
+    return bool(result.errors or result.problems or result.broken_refs)
+
+# Writes what went wrong in a run to `path` as JSON, for tools that sweep
+# many schema files and look at the failures afterwards.
+def write_error_report(path, result):
+    report = {
+        'schemas': result.names,
+        'quarantined': [ {
+            'schema': problem.json_name,
+            'namespace': problem.namespace,
+            'node': problem.path,
+            'problem': problem.message,
+            'pages': problem.pages,
+        } for problem in result.problems ],
+        'errors': [ {
+            'schema': name,
+            'page': what,
+            'error': tb.strip().splitlines()[-1],
+            'traceback': tb,
+        } for (name, what, tb) in result.errors ],
+        'unindexed': [ name for (name, what, tb) in result.unindexed ],
+        'broken_refs': [ {
+            'schema': ref.json_name,
+            'where': ref.where,
+            'kind': ref.kind,
+            'ref': ref.ref,
+        } for ref in result.broken_refs ],
+    }
+    out = open(path + '.tmp', 'w')
+    json.dump(report, out, indent=1, sort_keys=True, separators=(',', ': '))
+    out.close()
+    os.rename(path + '.tmp', path)
+
+def print_broken_refs(broken, in_dir):
+    for ref in broken:
+        print >>sys.stderr, '{}: {} refers to missing {} {}'.format(
+            os.path.basename(schema_path(in_dir, ref.json_name)), ref.where, ref.kind, ref.ref)
+
+# Options for what to generate and how, shared with publish.py.
+def add_arguments(parser):
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='render pages in N worker processes and report errors at the end')
+    parser.add_argument('--check-refs', action='store_true',
+                        help='report references that do not resolve to anything in in_dir')
+    parser.add_argument('--embed-types', action='store_true',
+                        help='describe referenced types in place instead of embedding their pages')
+    parser.add_argument('--select', nargs='?', const='', metavar='QUERY',
+                        help='also generate every namespace the feature files make available to QUERY, '
+                             'e.g. "channel=stable,extension_type=extension,context=blessed_extension" '
+                             '(the default), and note the permissions each page needs')
+    parser.add_argument('--description-cache', type=int, default=0, metavar='SIZE',
+                        help='remember up to SIZE type descriptions and report the hit rate')
+    parser.add_argument('--render-cache', metavar='DIR',
+                        help='keep rendered pages in DIR and reuse them in later builds')
+    parser.add_argument('--shared-render-cache', metavar='DIR',
+                        help='also look pages up in DIR, a render cache that several builders share')
+    parser.add_argument('--render-cache-size', type=int, default=RENDER_CACHE_MB, metavar='MB',
+                        help='remove the least recently used pages once a render cache is larger than '
+                             'this (default: %(default)s)')
+    parser.add_argument('--schema-cache', metavar='DIR',
+                        help='keep parsed schemas in DIR (default: a directory for in_dir under '
+                             '$XDG_CACHE_HOME/webext-docs, or ~/.cache/webext-docs)')
+    parser.add_argument('--no-schema-cache', action='store_true',
+                        help='parse every schema file, and do not keep what was parsed')
+    parser.add_argument('--keep-going', action='store_true',
+                        help='check schemas first, skip the pages they would fail to render, '
+                             'and render everything else')
+    parser.add_argument('--error-report', metavar='FILE',
+                        help='write the problems and errors of the run to FILE as JSON '
+                             '(implies --keep-going)')
+
+def config_from_args(parser, args):
+    if not args.names and args.select is None:
+        parser.error('give the names of the schemas to generate, or --select')
+
+    config = GenerateConfig(jobs=args.jobs, embed_types=args.embed_types,
+                            check_refs=args.check_refs,
+                            description_cache=args.description_cache,
+                            keep_going=args.keep_going or bool(args.error_report))
+    if not args.no_schema_cache:
+        config.schema_cache = args.schema_cache or default_schema_cache(args.in_dir)
+    if args.select is not None:
+        try:
+            config.select = features.Query.parse(args.select)
+        except features.QueryError as e:
+            parser.error('--select: {}'.format(e))
+
+    cache_bytes = args.render_cache_size * 1024 * 1024
+    if args.shared_render_cache:
+        config.render_cache = rendercache.RenderCache(args.shared_render_cache, cache_bytes)
+    if args.render_cache:
+        config.render_cache = rendercache.RenderCache(args.render_cache, cache_bytes,
+                                                      shared=config.render_cache)
+    return config
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate MDN pages from extension API schemas.')
+    parser.add_argument('in_dir')
+    parser.add_argument('out_dir')
+    parser.add_argument('names', nargs='*', metavar='name')
+    add_arguments(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help='only regenerate schema files that changed since the last build')
+    parser.add_argument('--bundle', action='store_true',
+                        help='write all pages to out_dir as a single JSON Lines file')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and regenerate pages when schema files change')
+    parser.add_argument('--format', choices=list(backends.BACKENDS), default='mdn',
+                        help='write pages for the MDN wiki (the default), as standalone HTML, '
+                             'or as Markdown')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record how long each stage and page takes, write a Chrome trace to FILE '
+                             'and print a summary')
+    args = parser.parse_args(argv)
+
+    if args.bundle and args.incremental:
+        parser.error('--bundle cannot be combined with --incremental')
+    if args.watch and (args.bundle or args.incremental or args.jobs):
+        parser.error('--watch cannot be combined with --bundle, --incremental or --jobs')
+
+    config = config_from_args(parser, args)
+    config.incremental = args.incremental
+    config.format = args.format
+
+    if args.trace:
+        instrument.enable()
+
+    if args.watch:
+        if not config.description_cache:
+            config.description_cache = DESCRIPTION_CACHE_SIZE
+        (build, result) = configure(args.names, args.in_dir, args.out_dir, config)
+        try:
+            Watch(build, result.names, args.check_refs).run()
+        except KeyboardInterrupt:
+            pass
+        if args.trace:
+            instrument.write_trace(args.trace)
+            instrument.print_summary()
+        return 0
+
+    out_sink = args.out_dir
+    if args.bundle:
+        out_sink = Bundle(args.out_dir)
+
+    try:
+        result = generate(args.names, args.in_dir, out_sink, config)
+    except:
+        if args.bundle:
+            out_sink.discard()
+        raise
+
+    if args.bundle:
+        out_sink.close()
+
+    if result.skipped:
+        print 'Skipped {} unchanged schema files'.format(result.skipped)
+    print_cache_stats(result)
+    if args.trace:
+        instrument.write_trace(args.trace)
+        instrument.print_summary()
+    if args.error_report:
+        write_error_report(args.error_report, result)
+
+    if print_result(result):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,289 @@
 import sys
 import os
 import json
+import time
+import argparse
+import threading
+import hashlib
+import email.utils
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
 import requests
+import requests.adapters
 
-MDN_BASE_URL = "https://developer.allizom.org"
+import ratelimit
+import instrument
 
-user = sys.argv[2]
-passwd = sys.argv[3]
+MDN_BASE_URL = "https://developer.allizom.org"
 
 headers = {'Content-type': 'application/json'}
 
-def upload(ns, name, head, data):
-    if name == 'INDEX':
-        url = MDN_BASE_URL + "/en-US/Add-ons/WebExtensions/API/" + ns
-    else:
-        url = MDN_BASE_URL + "/en-US/Add-ons/WebExtensions/API/" + ns + "/" + name
+# Responses worth retrying: rate limiting and server-side failures.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Status recorded for pages that were not uploaded because they have not
+# changed since the last successful upload.
+UNCHANGED = 'unchanged'
+
+# Name of the upload ledger kept in the output directory.
+LEDGER = '.upload-ledger.json'
+
+# The journal sits next to the ledger and records each page as soon as the
+# wiki has accepted it, so a run that is killed can be resumed.
+JOURNAL_SUFFIX = '.journal'
+
+# How often, in seconds, the main thread stops waiting for upload results so
+# that Python can deliver a Ctrl-C to it.
+RESULT_POLL = 0.5
 
-    j = json.loads(head)
+print_lock = threading.Lock()
+
+def log(message):
+    with print_lock:
+        print message
+
+def make_session(concurrency):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(headers)
+    return session
+
+def page_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+# The JSON that is PUT to the wiki for a page.
+def page_content(head, data):
+    j = dict(head)
     j['content'] = data
-    content = json.dumps(j)
+    return json.dumps(j, sort_keys=True)
+
+# How to talk to the wiki. `rate` caps requests per second, with bursts of
+# up to `burst`; `adaptive` lets the number of uploads in flight move
+# between 1 and `concurrency`. With `verbose`, each request and retry is
+# printed as it happens, as upload.py does.
+class UploadConfig(object):
+    __slots__ = ('base_url', 'user', 'password', 'concurrency', 'retries',
+                 'backoff', 'timeout', 'compare_live', 'rate', 'burst',
+                 'adaptive', 'verbose')
+
+    def __init__(self, base_url=MDN_BASE_URL, user=None, password=None,
+                 concurrency=8, retries=5, backoff=1.0, timeout=60,
+                 compare_live=False, rate=None, burst=None, adaptive=False,
+                 verbose=False):
+        self.base_url = base_url
+        self.user = user
+        self.password = password
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.compare_live = compare_live
+        self.rate = rate
+        self.burst = burst
+        self.adaptive = adaptive
+        self.verbose = verbose
+
+# The ledger holds one table per wiki, so uploading to staging does not mark
+# pages as up to date on production.
+def load_ledger(path, base_url):
+    if not os.path.exists(path):
+        return {}
+    return json.load(open(path)).get(base_url, {})
+
+def save_ledger(path, base_url, ledger):
+    wikis = {}
+    if os.path.exists(path):
+        wikis = json.load(open(path))
+    wikis[base_url] = ledger
+    out = open(path + '.tmp', 'w')
+    json.dump(wikis, out, indent=1, sort_keys=True, separators=(',', ': '))
+    out.close()
+    os.rename(path + '.tmp', path)
+
+# Appends one line per uploaded page and flushes it to disk before the next
+# upload, so at most the page in flight is lost when a run dies. Lines are
+# tagged with the wiki, like the ledger's tables.
+class Journal(object):
+    def __init__(self, path, base_url):
+        self.path = path
+        self.base_url = base_url
+        self.out = open(path, 'a')
+        self.lock = threading.Lock()
+
+    def record(self, slug, digest):
+        line = json.dumps({'wiki': self.base_url, 'slug': slug, 'hash': digest})
+        with self.lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+            os.fsync(self.out.fileno())
+
+    def close(self):
+        self.out.close()
+
+    # The run finished and the ledger has everything the journal had.
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+# Adds the pages an interrupted run uploaded to the ledger, and returns how
+# many there were. A torn last line is ignored.
+def replay_journal(path, base_url, ledger):
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    for line in open(path):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if entry['wiki'] == base_url:
+            ledger[entry['slug']] = entry['hash']
+            count += 1
+    return count
+
+# A connection to one wiki, with its flow control, its request statistics
+# and the ledger of what it has uploaded. It is shared by the upload
+# threads.
+class WikiClient(object):
+    def __init__(self, config, ledger=None, journal=None):
+        self.config = config
+        self.auth = (config.user, config.password)
+        self.session = make_session(config.concurrency)
+        # Maps ns/name to the hash of the page last uploaded successfully.
+        self.ledger = ledger if ledger is not None else {}
+        self.ledger_lock = threading.Lock()
+        self.journal = journal
+        self.telemetry = ratelimit.Telemetry()
+
+        self.rate_limiter = None
+        if config.rate:
+            self.rate_limiter = ratelimit.TokenBucket(config.rate, config.burst)
+        self.concurrency_controller = None
+        if config.adaptive:
+            self.concurrency_controller = ratelimit.AdaptiveConcurrency(
+                max(1, config.concurrency // 4), config.concurrency)
+
+    def page_url(self, ns, name):
+        if name == 'INDEX':
+            return self.config.base_url + "/en-US/Add-ons/WebExtensions/API/" + ns
+        else:
+            return self.config.base_url + "/en-US/Add-ons/WebExtensions/API/" + ns + "/" + name
+
+    def retry_delay(self, response, attempt):
+        retry_after = None
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+
+        if retry_after:
+            if retry_after.strip().isdigit():
+                return float(retry_after)
+            date = email.utils.parsedate_tz(retry_after)
+            if date:
+                return max(0, email.utils.mktime_tz(date) - time.time())
+
+        return self.config.backoff * (2 ** attempt)
+
+    # Makes one request, once the rate limiter and the concurrency
+    # controller allow it, and records how long it took.
+    def send(self, method, url, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self.concurrency_controller is not None:
+            self.concurrency_controller.acquire()
+        status = None
+        start = time.time()
+        instrument.count('http requests')
+        if 'data' in kwargs:
+            instrument.count('bytes sent', len(kwargs['data']))
+        try:
+            with instrument.span('http ' + method, url):
+                response = self.session.request(method, url, auth=self.auth,
+                                                timeout=self.config.timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            latency = time.time() - start
+            self.telemetry.record(latency, status)
+            if self.concurrency_controller is not None:
+                ok = status is not None and status not in RETRY_STATUSES
+                self.concurrency_controller.release(latency, ok)
+
+    # PUT with retries. Returns (status, error); error is None on success.
+    def put_page(self, url, content):
+        attempt = 0
+        while True:
+            response = None
+            status = None
+            try:
+                response = self.send('PUT', url, data=content)
+                status = response.status_code
+                if status not in RETRY_STATUSES:
+                    if status >= 400:
+                        return (status, 'HTTP {}'.format(status))
+                    return (status, None)
+                error = 'HTTP {}'.format(status)
+            except requests.RequestException as e:
+                error = '{}: {}'.format(e.__class__.__name__, e)
+
+            if attempt >= self.config.retries:
+                return (status, error)
+
+            delay = self.retry_delay(response, attempt)
+            instrument.count('http retries')
+            if self.config.verbose:
+                log('{} {}, retrying in {:.1f}s'.format(url, error, delay))
+            time.sleep(delay)
+            attempt += 1
+
+    # Whether the wiki already has this content. Only the page body is
+    # compared; MDN does not return the title and tags in raw mode.
+    def live_page_matches(self, url, data):
+        try:
+            response = self.send('GET', url, params={'raw': 1})
+        except requests.RequestException:
+            return False
+        if response.status_code != 200:
+            return False
+        if not isinstance(data, unicode):
+            data = data.decode('utf-8')
+        return response.text.strip() == data.strip()
 
-    print url
-    r = requests.put(url, auth=(user, passwd), headers=headers, data=content)
-    print r.status_code
+    # Whether the ledger says the wiki already has this page.
+    def is_unchanged(self, slug, digest):
+        with self.ledger_lock:
+            return self.ledger.get(slug) == digest
+
+    # Returns (slug, status, error).
+    def upload_page(self, ns, name, head, data):
+        slug = ns + '/' + name
+        url = self.page_url(ns, name)
+
+        content = page_content(head, data)
+
+        digest = page_hash(content)
+        unchanged = self.is_unchanged(slug, digest)
+        if not unchanged and self.config.compare_live:
+            unchanged = self.live_page_matches(url, data)
+
+        if unchanged:
+            status = UNCHANGED
+            error = None
+            instrument.count('pages unchanged')
+        else:
+            (status, error) = self.put_page(url, content)
+
+        if error is None:
+            with self.ledger_lock:
+                self.ledger[slug] = digest
+            if self.journal is not None and status != UNCHANGED:
+                self.journal.record(slug, digest)
+
+        if self.config.verbose:
+            log('{} {}'.format(url, status))
+        return (slug, status, error)
 
 def read_head(f):
     head = ''
@@ -33,22 +294,246 @@ def read_head(f):
             break
     return head
 
-def upload_file(ns, name, fpath):
+# Reads a page file as (head, data), with the head parsed.
+def read_page_file(fpath):
     f = open(fpath)
-    head = read_head(f)
+    head = json.loads(read_head(f))
     data = f.read()
-    upload(ns, name, head, data)
     f.close()
+    return (head, data)
+
+# Pages in a bundle written by json-transform.py --bundle, as
+# (ns, name, (head, data)). The bundle is read twice, once for the INDEX
+# pages and once for the rest, so it is never held in memory as a whole.
+def read_bundle(path, index):
+    f = open(path)
+    for line in f:
+        record = json.loads(line)
+        (ns, name) = record['slug'].split('/')
+        if (name == 'INDEX') == index:
+            yield (ns, name, (record['head'], record['body']))
+    f.close()
+
+# The upload plan: every page under out_dir as (ns, name, path), or every
+# page in the bundle if out_dir is a file, in two batches. A page's parent
+# must exist before it is created, so the INDEX pages, which are the parents
+# of the other pages in their namespace, make up the first batch. Pages
+# are in namespace order.
+def list_pages(out_dir):
+    if os.path.isfile(out_dir):
+        return (read_bundle(out_dir, True), read_bundle(out_dir, False))
+
+    index_pages = []
+    pages = []
+    for ns in sorted(os.listdir(out_dir)):
+        path = os.path.join(out_dir, ns)
+        if not os.path.isdir(path): continue
+
+        index_pages.append((ns, 'INDEX', os.path.join(path, 'INDEX')))
+
+        for name in sorted(os.listdir(path)):
+            if name == 'INDEX' or name.startswith('.'): continue
+            pages.append((ns, name, os.path.join(path, name)))
+    return (index_pages, pages)
+
+# The same two batches for (slug, head, body) records, such as those
+# transform.generate() hands to its sink.
+def batch_records(records):
+    index_pages = []
+    pages = []
+    for (slug, head, body) in records:
+        (ns, name) = slug.split('/')
+        if name == 'INDEX':
+            index_pages.append((ns, name, (head, body)))
+        else:
+            pages.append((ns, name, (head, body)))
+    return (index_pages, pages)
+
+def read_source(source):
+    if isinstance(source, basestring):
+        return read_page_file(source)
+    return source
+
+# Prints what a run would do, without contacting the wiki, and returns the
+# number of requests it would make. With compare_live, changed pages cost a
+# GET as well, and may turn out not to need their PUT.
+def print_plan(out_dir, client):
+    requests_needed = 0
+    for (i, batch) in enumerate(list_pages(out_dir)):
+        total = 0
+        changed = 0
+        for (ns, name, source) in batch:
+            (head, data) = read_source(source)
+            total += 1
+            if client.is_unchanged(ns + '/' + name, page_hash(page_content(head, data))):
+                continue
+            changed += 1
+            print '  PUT {}'.format(client.page_url(ns, name))
+        print 'Batch {}: {} pages, {} to upload'.format(i + 1, total, changed)
+        requests_needed += changed * (2 if client.config.compare_live else 1)
+    print 'Estimated requests: {}'.format(requests_needed)
+    return requests_needed
+
+# Uploads pages with `client`, and returns (slug, status, error) for each.
+# `pages` is an output directory or bundle written by json-transform.py, or
+# a list of (slug, head, body) records.
+def upload(pages, client):
+    if isinstance(pages, basestring):
+        batches = list_pages(pages)
+    else:
+        batches = batch_records(pages)
+
+    pool = ThreadPool(client.config.concurrency)
+
+    def upload_one(page):
+        (ns, name, source) = page
+        try:
+            with instrument.span('read', ns + '/' + name):
+                (head, data) = read_source(source)
+            return client.upload_page(ns, name, head, data)
+        except Exception as e:
+            return (ns + '/' + name, None, '{}: {}'.format(e.__class__.__name__, e))
+
+    results = []
+    try:
+        for batch in batches:
+            pending = pool.imap_unordered(upload_one, batch)
+            while True:
+                try:
+                    results.append(pending.next(RESULT_POLL))
+                except multiprocessing.TimeoutError:
+                    continue
+                except StopIteration:
+                    break
+    # Pages that have not started are dropped, and the ones in flight are
+    # waited for, so that the ledger records every page the wiki accepted.
+    except:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+    return results
+
+def print_summary(results, client):
+    failures = sorted([ (slug, error) for (slug, status, error) in results if error ])
+    unchanged = len([ True for (slug, status, error) in results if status == UNCHANGED ])
+    uploaded = len(results) - len(failures) - unchanged
+    print '{} pages uploaded, {} unchanged, {} failed'.format(uploaded, unchanged, len(failures))
+    for (slug, error) in failures:
+        print '  {}: {}'.format(slug, error)
+    print client.telemetry.summary()
+    controller = client.concurrency_controller
+    if controller is not None:
+        print 'Concurrency ended at {} (peak {})'.format(controller.limit, controller.peak)
+    return failures
+
+# Options for talking to the wiki, shared with publish.py.
+def add_arguments(parser, ledger_location='the output directory'):
+    defaults = UploadConfig()
+    parser.add_argument('--base-url', default=defaults.base_url,
+                        help='wiki to upload to')
+    parser.add_argument('--concurrency', type=int, default=defaults.concurrency,
+                        help='number of uploads in flight at once')
+    parser.add_argument('--retries', type=int, default=defaults.retries,
+                        help='retries for 429, 5xx and network errors')
+    parser.add_argument('--backoff', type=float, default=defaults.backoff,
+                        help='initial retry delay in seconds, doubled on each retry')
+    parser.add_argument('--ledger', default=None,
+                        help='upload ledger to use (default: {} in {})'.format(LEDGER, ledger_location))
+    parser.add_argument('--force', action='store_true',
+                        help='upload every page, even those the ledger says are unchanged, and '
+                             'delete the journal of an interrupted run instead of resuming it')
+    parser.add_argument('--compare-live', action='store_true',
+                        help='fetch each changed page from the wiki and skip it if the content already matches')
+    parser.add_argument('--timeout', type=float, default=defaults.timeout,
+                        help='per-request timeout in seconds')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='send at most this many requests per second')
+    parser.add_argument('--burst', type=int, default=None,
+                        help='requests that --rate allows at once after a quiet spell (default: one second\'s worth)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='start below --concurrency and adjust to server latency and 429s')
+
+def config_from_args(args):
+    return UploadConfig(base_url=args.base_url, user=args.user, password=args.passwd,
+                        concurrency=args.concurrency, retries=args.retries,
+                        backoff=args.backoff, timeout=args.timeout,
+                        compare_live=args.compare_live, rate=args.rate,
+                        burst=args.burst, adaptive=args.adaptive, verbose=True)
+
+# Loads the ledger and adds what an interrupted run left in the journal next
+# to it. With `force`, neither is read, so every page counts as changed.
+def open_ledger(ledger_path, base_url, force):
+    if force:
+        return {}
+    ledger = load_ledger(ledger_path, base_url)
+    resumed = replay_journal(ledger_path + JOURNAL_SUFFIX, base_url, ledger)
+    if resumed:
+        print 'Resuming an interrupted run: {} pages were already uploaded'.format(resumed)
+    return ledger
+
+# A client for a run that records each upload in a new journal. A forced
+# run deletes the journal left by an interrupted one first, since the new
+# journal is appended to it and would otherwise carry its pages into a
+# later resume.
+def start_run(config, ledger_path, force):
+    ledger = open_ledger(ledger_path, config.base_url, force)
+    journal_path = ledger_path + JOURNAL_SUFFIX
+    if force and os.path.exists(journal_path):
+        os.remove(journal_path)
+    return WikiClient(config, ledger, Journal(journal_path, config.base_url))
+
+# Saves the ledger and removes the journal, which the ledger now covers.
+def finish_run(client, ledger_path):
+    with client.ledger_lock:
+        save_ledger(ledger_path, client.config.base_url, dict(client.ledger))
+    client.journal.remove()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Upload generated pages to MDN.')
+    parser.add_argument('out_dir', help='output directory or bundle written by json-transform.py')
+    parser.add_argument('user')
+    parser.add_argument('passwd')
+    add_arguments(parser)
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record the time spent reading pages and in each request, write a Chrome trace '
+                             'to FILE and print a summary')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the pages that would be uploaded and the number of requests, and stop')
+    args = parser.parse_args(argv)
+
+    config = config_from_args(args)
+    if args.trace:
+        instrument.enable()
+
+    if args.ledger:
+        ledger_path = args.ledger
+    elif os.path.isfile(args.out_dir):
+        ledger_path = args.out_dir + LEDGER
+    else:
+        ledger_path = os.path.join(args.out_dir, LEDGER)
 
-for ns in os.listdir(sys.argv[1]):
-    path = os.path.join(sys.argv[1], ns)
-    upload_file(ns, 'INDEX', os.path.join(path, 'INDEX'))
+    if args.dry_run:
+        ledger = open_ledger(ledger_path, config.base_url, args.force)
+        print_plan(args.out_dir, WikiClient(config, ledger))
+        return 0
 
-    for name in os.listdir(path):
-        if name == 'INDEX': continue
+    client = start_run(config, ledger_path, args.force)
+    try:
+        results = upload(args.out_dir, client)
+    finally:
+        finish_run(client, ledger_path)
+        if args.trace:
+            instrument.write_trace(args.trace)
+    failures = print_summary(results, client)
+    if args.trace:
+        instrument.print_summary(sys.stdout)
+    if failures:
+        return 1
+    return 0
 
-        fpath = os.path.join(path, name)
-        f = open(fpath)
-        head = read_head(f)
-        data = f.read()
-        upload(ns, name, head, data)
+if __name__ == '__main__':
+    sys.exit(main())
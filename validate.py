@@ -0,0 +1,183 @@
+# Checks parsed schemas against the shapes the page generators can render,
+# so that a batch run can set aside the pages a schema would break before
+# rendering starts, instead of failing part way through them.
+#
+# Each kind of node has its own list of checks, put together once when the
+# module is loaded, and check() visits every node of a namespace once,
+# running the checks for the place the node is in. A node's place decides
+# what the generators do with it: a parameter is described with
+# describe_type, a top-level type gets a page of its own, and the items of
+# an array are only described through the array.
+#
+# Run on its own to check every schema file in a directory:
+#
+# python validate.py data/ [names...]
+
+import re
+import sys
+import argparse
+
+class Problem(object):
+    __slots__ = ('json_name', 'namespace', 'path', 'message', 'pages')
+
+    # `path` names the node, such as "tabs.create.createProperties.url", and
+    # `pages` are the slugs of the pages it would break.
+    def __init__(self, json_name, namespace, path, message, pages):
+        self.json_name = json_name
+        self.namespace = namespace
+        self.path = path
+        self.message = message
+        self.pages = pages
+
+    def __repr__(self):
+        return '<Problem {} {}>'.format(self.path, self.message)
+
+# Page generators format text into byte string templates, which only takes
+# ASCII.
+_NON_ASCII = re.compile(u'[^\x00-\x7f]')
+
+def _untyped(node):
+    if node.type is None and node.choices is None and node.ref is None:
+        return 'has no type, choices or $ref'
+
+def _itemless(node):
+    if node.type == 'array' and node.items is None:
+        return 'is an array without items'
+
+def _pageless(node):
+    if node.type is None:
+        return 'is a type with {}, but only object, string and array types have pages'.format(
+            'choices' if node.choices is not None else 'a $ref')
+    if node.type not in ('object', 'string', 'array'):
+        return 'is a {} type, but only object, string and array types have pages'.format(node.type)
+
+def _variable_length(node):
+    if node.type == 'array' and node.min_items is not None and node.min_items != node.max_items:
+        return 'has minItems {} but maxItems {}'.format(node.min_items, node.max_items)
+
+def _paramless(node):
+    if node.parameters is None:
+        return 'is a function without parameters'
+
+def _non_ascii(node):
+    for text in (node.name, node.description):
+        if text and _NON_ASCII.search(text):
+            return 'has non-ASCII text: {!r}'.format(text)
+
+def _non_ascii_enum(node):
+    for value in node.enum or []:
+        if not isinstance(value, basestring):
+            for text in (value.name, value.description):
+                if text and _NON_ASCII.search(text):
+                    return 'has a non-ASCII enum value: {!r}'.format(text)
+
+# The checks for each place a node can be in, as (check, on_index) pairs.
+# With on_index, a problem also breaks the namespace's INDEX page, which
+# lists the node's description.
+_PLACES = {
+    'namespace': [(_non_ascii, True)],
+    'function': [(_paramless, False), (_non_ascii, True)],
+    'event': [(_non_ascii, True)],
+    'property': [(_non_ascii, True)],
+    'type': [(_pageless, False), (_variable_length, False), (_itemless, False),
+             (_non_ascii, True), (_non_ascii_enum, False)],
+    'param': [(_untyped, False), (_itemless, False), (_non_ascii, False)],
+    'member': [(_untyped, False), (_itemless, False), (_non_ascii, False)],
+    'returns': [(_untyped, False), (_itemless, False), (_non_ascii, False)],
+    'items': [(_untyped, False), (_itemless, False)],
+    'choice': [(_untyped, False), (_itemless, False)],
+    # Returned values of functions passed as parameters are not described.
+    'unused': [],
+}
+
+_CHECKS = dict((place, tuple(checks)) for (place, checks) in _PLACES.items())
+
+# Nothing under a node in these places is described on any page.
+_LEAVES = frozenset(['property', 'unused'])
+
+class _Checker(object):
+    def __init__(self, json_name, ns):
+        self.json_name = json_name
+        self.ns = ns
+        self.index = ns.name + '/INDEX'
+        self.problems = []
+
+    def visit(self, node, place, path, page):
+        for (check, on_index) in _CHECKS[place]:
+            message = check(node)
+            if message:
+                pages = [page]
+                if on_index and page != self.index:
+                    pages.append(self.index)
+                self.problems.append(Problem(self.json_name, self.ns.name, path, message, pages))
+        if place in _LEAVES:
+            return
+
+        if node.choices is not None:
+            for (i, choice) in enumerate(node.choices):
+                self.visit(choice, 'choice', '{}.choices[{}]'.format(path, i), page)
+        if node.items is not None:
+            self.visit(node.items, 'items', path + '.items', page)
+        for prop in node.properties or []:
+            self.visit(prop, 'member', path + '.' + prop.name, page)
+        for param in node.parameters or []:
+            self.visit(param, 'param', path + '.' + (param.name or '?'), page)
+        if node.returns is not None:
+            returns = 'returns' if place in ('function', 'event') else 'unused'
+            self.visit(node.returns, returns, path + '.returns', page)
+
+    def check(self):
+        ns = self.ns
+        for (check, on_index) in _CHECKS['namespace']:
+            message = check(ns)
+            if message:
+                self.problems.append(Problem(self.json_name, ns.name, ns.name, message, [self.index]))
+
+        for func in ns.functions or []:
+            self.visit(func, 'function', ns.name + '.' + func.name, ns.name + '/' + func.name)
+        for prop in ns.properties or []:
+            self.visit(prop, 'property', ns.name + '.' + prop.name, ns.name + '/' + prop.name)
+        for t in ns.types or []:
+            self.visit(t, 'type', ns.name + '.' + t.id, ns.name + '/' + t.id)
+        for event in ns.events or []:
+            path = ns.name + '.' + event.name
+            page = ns.name + '/' + event.name
+            self.visit(event, 'event', path, page)
+            for param in event.extra_parameters:
+                self.visit(param, 'param', path + '.' + param.name, page)
+        return self.problems
+
+# The problems in the namespaces of schema file `json_name`.
+def check(namespaces, json_name):
+    problems = []
+    for ns in namespaces:
+        problems.extend(_Checker(json_name, ns).check())
+    return problems
+
+def print_problems(problems, out=sys.stderr):
+    for problem in problems:
+        print >>out, '{}: {} {}'.format(problem.json_name, problem.path, problem.message)
+
+def main(argv=None):
+    import transform
+
+    parser = argparse.ArgumentParser(description='Check schemas against what the page generators support.')
+    parser.add_argument('in_dir')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='schema files to check (default: all of them)')
+    args = parser.parse_args(argv)
+
+    names = args.names or transform.schema_names(args.in_dir)
+    (problems, errors) = transform.validate_schemas(transform.Build(args.in_dir), names)
+    for (name, what, tb) in errors:
+        print >>sys.stderr, 'Failed to load {}:'.format(what)
+        print >>sys.stderr, tb
+    print_problems(problems)
+    print >>sys.stderr, '{} schema files, {} problems, {} unreadable'.format(
+        len(names), len(problems), len(errors))
+    if problems or errors:
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# Waits for files to change, for json-transform.py --watch.
+#
+# On Linux the directories holding the files are watched with inotify, so a
+# change is seen as soon as the file is written. Elsewhere, or if inotify is
+# not available, the files are polled.
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# How long to keep collecting events after the first one, so that an editor
+# that writes a file in several steps causes one rebuild.
+SETTLE = 0.05
+
+class PollingWatcher(object):
+    def __init__(self, paths, interval=0.2):
+        self.paths = set(paths)
+        self.interval = interval
+        self.state = dict((path, self._stat(path)) for path in self.paths)
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime, st.st_size, st.st_ino)
+
+    # Blocks until some of the paths change, and returns those paths.
+    def wait(self):
+        while True:
+            time.sleep(self.interval)
+            changed = set()
+            for path in self.paths:
+                st = self._stat(path)
+                if st != self.state[path]:
+                    self.state[path] = st
+                    changed.add(path)
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+# Events that mean a file in a watched directory has new contents. Editors
+# often write a new file and rename it over the old one.
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT = struct.Struct('iIII')
+
+class InotifyWatcher(object):
+    def __init__(self, paths):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify is only available on Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+
+        # Events name absolute paths; wait() returns the paths it was given.
+        self.paths = dict((os.path.abspath(path), path) for path in paths)
+        self.dirs = {}
+        for path in self.paths:
+            directory = os.path.dirname(path)
+            if directory in self.dirs.values():
+                continue
+            wd = libc.inotify_add_watch(self.fd, directory, IN_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(error, 'inotify_add_watch failed for ' + directory)
+            self.dirs[wd] = directory
+
+    def _read(self, timeout):
+        changed = set()
+        (readable, _, _) = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+
+        buf = os.read(self.fd, 65536)
+        offset = 0
+        while offset < len(buf):
+            (wd, mask, cookie, length) = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = buf[offset:offset + length].rstrip('\0')
+            offset += length
+            path = os.path.join(self.dirs.get(wd, ''), name)
+            if path in self.paths:
+                changed.add(self.paths[path])
+        return changed
+
+    def wait(self):
+        while True:
+            changed = self._read(None)
+            if not changed:
+                continue
+            while True:
+                more = self._read(SETTLE)
+                if not more:
+                    return changed
+                changed |= more
+
+    def close(self):
+        os.close(self.fd)
+
+def make_watcher(paths):
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError):
+        return PollingWatcher(paths)